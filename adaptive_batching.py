@@ -0,0 +1,140 @@
+import json
+import os
+import statistics
+import threading
+
+from upload_errors import is_overload
+
+# Where the batch sizes chosen by each run are recorded, per table
+BATCH_SIZES_FILE = os.path.join('.fishapp', 'batch_sizes.json')
+
+DEFAULT_MIN_BATCH_SIZE = 10
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+# Gateways in front of Supabase reject request bodies above a few MB
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+
+class AdaptiveBatchSizer:
+    """Choose the batch size of one table from measured latency and payload bytes.
+
+    The size grows by `growth` while the latency per row keeps improving by
+    more than `tolerance`, holds once it stops improving, and is cut by
+    `backoff` on timeouts, 413 and 5xx responses. It never leaves
+    [min_size, max_size] and never exceeds max_batch_bytes of JSON.
+    Thread-safe: completions are recorded from the uploader's worker threads.
+    """
+
+    def __init__(self, initial_size=100, min_size=DEFAULT_MIN_BATCH_SIZE, max_size=DEFAULT_MAX_BATCH_SIZE,
+                 growth=1.5, backoff=0.5, tolerance=0.05, max_batch_bytes=DEFAULT_MAX_BATCH_BYTES):
+        if not 0 < min_size <= max_size:
+            raise ValueError(f"invalid batch size bounds: {min_size}..{max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.growth = growth
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_batch_bytes = max_batch_bytes
+        self.initial_size = self._clamp(initial_size)
+        self.size = self.initial_size
+        self.bytes_per_row = None
+        self.best_row_latency = None
+        self.history = []
+        self._lock = threading.Lock()
+
+    def _clamp(self, size):
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def measure_rows(self, rows):
+        """Estimate JSON bytes per row (uncompressed, as sinks.encode_rows writes it) from a sample, once per table"""
+        if self.bytes_per_row is None and rows:
+            sample = rows[:50]
+            self.bytes_per_row = len(json.dumps(sample, default=str, separators=(',', ':'))) / len(sample)
+
+    def _effective_size(self):
+        size = self.size
+        if self.max_batch_bytes and self.bytes_per_row:
+            size = min(size, int(self.max_batch_bytes // self.bytes_per_row))
+        return self._clamp(size)
+
+    def current_size(self):
+        """Size the next batch would get, without recording it"""
+        with self._lock:
+            return self._effective_size()
+
+    def next_size(self):
+        """Number of rows to put in the next batch"""
+        with self._lock:
+            size = self._effective_size()
+            self.history.append(size)
+            return size
+
+    def record(self, rows, seconds, error=None):
+        """Feed back the outcome of one batch of `rows` rows that took `seconds`"""
+        with self._lock:
+            if error is not None:
+                if is_overload(error):
+                    self.size = self._clamp(min(self.size, rows) * self.backoff)
+                    self.best_row_latency = None
+                    if self.bytes_per_row and self.max_batch_bytes:
+                        self.max_batch_bytes = min(self.max_batch_bytes,
+                                                   max(rows * self.bytes_per_row * self.backoff,
+                                                       self.min_size * self.bytes_per_row))
+                return
+
+            if rows != self._effective_size() or seconds <= 0:
+                # Short tail batch or a batch cut before the last resize: no signal
+                return
+            row_latency = seconds / rows
+            if self.best_row_latency is None or row_latency < self.best_row_latency * (1 - self.tolerance):
+                self.best_row_latency = row_latency
+                self.size = self._clamp(self.size * self.growth)
+
+    def summary(self):
+        """Sizes chosen so far, for tuning the default of this table"""
+        with self._lock:
+            history = list(self.history)
+        if not history:
+            return {'initial': self.initial_size, 'final': self.size, 'batches': 0}
+        return {
+            'initial': self.initial_size,
+            'final': self.size,
+            'min': min(history),
+            'max': max(history),
+            'median': int(statistics.median(history)),
+            'batches': len(history),
+            'bytes_per_row': round(self.bytes_per_row, 1) if self.bytes_per_row else None
+        }
+
+
+def load_batch_sizes(path=BATCH_SIZES_FILE):
+    """Per-table batch sizes recorded by previous runs ({} if none)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_batch_sizes(sizers, path=BATCH_SIZES_FILE):
+    """Record the sizes each table's sizer chose, merged with earlier runs"""
+    recorded = load_batch_sizes(path)
+    for table_name, sizer in sizers.items():
+        recorded[table_name] = sizer.summary()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(recorded, f, indent=2, sort_keys=True)
+    return recorded
+
+
+def make_sizers(table_names, initial_size=100, min_size=DEFAULT_MIN_BATCH_SIZE,
+                max_size=DEFAULT_MAX_BATCH_SIZE, path=BATCH_SIZES_FILE):
+    """One sizer per table, starting from the size the last run settled on"""
+    recorded = load_batch_sizes(path) if path else {}
+    sizers = {}
+    for table_name in table_names:
+        start = recorded.get(table_name, {}).get('final', initial_size)
+        sizers[table_name] = AdaptiveBatchSizer(start, min_size=min_size, max_size=max_size)
+    return sizers
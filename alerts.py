@@ -0,0 +1,335 @@
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+ALERT_STATE_FILE = '.fishapp/alert_state.json'
+ALERTS_FILE = '.fishapp/alerts.jsonl'
+ALERT_STATE_VERSION = 1
+
+# Fixed limits, alert -> (metric, 'below' or 'above', limit); see README_Dashboard.md
+THRESHOLD_RULES = {
+    'low_dissolved_oxygen': ('dissolved_oxygen', 'below', 4.0),
+    'high_wind': ('wind_speed', 'above', 15.0),
+    'heavy_rain': ('rainfall', 'above', 10.0),
+    'low_pressure': ('air_pressure', 'below', 1000.0),
+    'low_flow': ('flow_rate', 'below', 5.0),
+    'high_lirio_coverage': ('lirio_coverage', 'above', 80.0)
+}
+
+# Spikes, alert -> metric: a rising reading more than SPIKE_SIGMAS standard
+# deviations above the metric's EWMA, once MIN_SAMPLES readings are known
+SPIKE_RULES = {
+    'ammonia_spike': 'ammonia',
+    'nitrite_spike': 'nitrite'
+}
+SPIKE_SIGMAS = 4.0
+MIN_SAMPLES = 24
+
+# Aerator off (aerator_status 0) while dissolved oxygen is below this, in mg/L
+AERATOR_OFF_DO_LIMIT = 5.0
+
+# Weight of the newest reading in the EWMA (0 < alpha < 1)
+EWMA_ALPHA = 0.1
+
+# Readings per farm folded into the running statistics per vectorized pass;
+# (1 - alpha) ** -READINGS_PER_BLOCK must stay well inside float range
+READINGS_PER_BLOCK = 64
+
+# Metrics with running statistics (count, mean, M2, EWMA, last value, rate of change)
+STAT_METRICS = ('dissolved_oxygen', 'ammonia', 'nitrite')
+_STATS = ('count', 'mean', 'm2', 'ewma', 'last', 'time', 'rate')
+
+_NEVER = np.iinfo('int64').min
+_NS_PER_HOUR = 3600 * 10 ** 9
+
+
+def _as_nanoseconds(timestamps):
+    return np.asarray(timestamps, dtype='datetime64[ns]').view('int64')
+
+
+def _iso(nanoseconds):
+    return np.datetime_as_string(nanoseconds.astype('datetime64[ns]').astype('datetime64[s]'), unit='s') + 'Z'
+
+
+class AlertEngine:
+    """Water-quality and equipment alerts over the readings of every ingest, in O(1) per reading.
+
+    Per farm it keeps, for each of STAT_METRICS, Welford's count, mean and
+    M2, an EWMA, the last value and the rate of change per hour, plus
+    whether each alert is currently active. Alerts fire when their
+    condition starts; they can fire again once it has cleared. Readings
+    not newer than the last one seen of their farm are ignored, so feeding
+    the same rows twice (or rows restored from a snapshot) changes nothing.
+    """
+
+    def __init__(self, target=None, ewma_alpha=EWMA_ALPHA):
+        self.target = target
+        self.ewma_alpha = ewma_alpha
+        self.farm_ids = []
+        self._slots = {}
+        self.seen = np.empty(0, dtype='int64')
+        self.stats = {metric: self._blank_stats(0) for metric in STAT_METRICS}
+        self.active = {alert: np.empty(0, dtype=bool) for alert in self.alert_names()}
+        # Alerts raised since this engine was created or restored, by name
+        self.raised = Counter()
+
+    @staticmethod
+    def alert_names():
+        return list(THRESHOLD_RULES) + list(SPIKE_RULES) + ['aerator_off_low_oxygen']
+
+    @staticmethod
+    def _blank_stats(size):
+        stats = {name: np.zeros(size) for name in ('mean', 'm2', 'ewma', 'rate')}
+        stats['count'] = np.zeros(size, dtype='int64')
+        stats['last'] = np.full(size, np.nan)
+        stats['time'] = np.full(size, _NEVER, dtype='int64')
+        return stats
+
+    def _slots_of(self, farm_ids):
+        """State slot of every farm id, adding slots for farms seen for the first time"""
+        unique, inverse = np.unique(farm_ids, return_inverse=True)
+        new = [int(farm_id) for farm_id in unique if int(farm_id) not in self._slots]
+        if new:
+            for farm_id in new:
+                self._slots[farm_id] = len(self.farm_ids)
+                self.farm_ids.append(farm_id)
+            self.seen = np.concatenate([self.seen, np.full(len(new), _NEVER, dtype='int64')])
+            blank = self._blank_stats(len(new))
+            for stats in self.stats.values():
+                for name in _STATS:
+                    stats[name] = np.concatenate([stats[name], blank[name]])
+            for alert in self.active:
+                self.active[alert] = np.concatenate([self.active[alert], np.zeros(len(new), dtype=bool)])
+        return np.array([self._slots[int(farm_id)] for farm_id in unique], dtype='int64')[inverse.ravel()]
+
+    def observe(self, arrays):
+        """Feed projected arrays (project_arrays output); returns the alerts raised, oldest first.
+
+        Each farm's readings are applied in time order, but nothing loops
+        per reading: every rule is evaluated for all readings at once, and
+        the running statistics advance READINGS_PER_BLOCK readings per farm
+        in each vectorized pass.
+        """
+        if not len(arrays['farm_id']):
+            return []
+        slots = self._slots_of(arrays['farm_id'])
+        times = _as_nanoseconds(arrays['timestamp'])
+        order = np.lexsort((times, slots))
+        slots, times = slots[order], times[order]
+        # Only readings newer than the farm's last one; of repeated timestamps the last row wins
+        keep = times > self.seen[slots]
+        keep[:-1] &= (slots[1:] != slots[:-1]) | (times[1:] != times[:-1])
+        order, slots, times = order[keep], slots[keep], times[keep]
+        if not len(order):
+            return []
+        values = {metric: np.asarray(column, dtype='float64')[order]
+                  for metric, column in arrays.items() if metric not in ('farm_id', 'timestamp')}
+
+        # alert -> (metric, condition of every reading, limit of every reading)
+        conditions = {}
+        for alert, (metric, direction, limit) in THRESHOLD_RULES.items():
+            if metric in values:
+                value = values[metric]
+                conditions[alert] = (metric, value < limit if direction == 'below' else value > limit,
+                                     np.full(len(value), limit))
+        if 'aerator_status' in values and 'dissolved_oxygen' in values:
+            oxygen = values['dissolved_oxygen']
+            conditions['aerator_off_low_oxygen'] = (
+                'dissolved_oxygen', (values['aerator_status'] == 0) & (oxygen < AERATOR_OFF_DO_LIMIT),
+                np.full(len(oxygen), AERATOR_OFF_DO_LIMIT))
+        # The spike rules compare each reading with the statistics of the readings before it
+        priors = {metric: self._advance(metric, slots, times, values[metric])
+                  for metric in self.stats if metric in values}
+        for alert, metric in SPIKE_RULES.items():
+            if metric in priors:
+                count, ewma, std, last = priors[metric]
+                limit = ewma + SPIKE_SIGMAS * std
+                value = values[metric]
+                conditions[alert] = (metric, (count >= MIN_SAMPLES) & (value > limit) & (value > last), limit)
+        np.maximum.at(self.seen, slots, times)
+
+        alerts = []
+        for alert, (metric, condition, limit) in conditions.items():
+            raised = self._edges(alert, slots, condition, ~np.isnan(values[metric]))
+            alerts.extend(self._records(alert, metric, slots[raised], times[raised],
+                                        values[metric][raised], limit[raised]))
+        alerts.sort(key=lambda alert: alert['timestamp'])
+        self.raised.update(alert['alert'] for alert in alerts)
+        return alerts
+
+    def _edges(self, alert, slots, condition, known):
+        """Readings where the alert's condition starts to hold for its farm; updates self.active.
+
+        Readings whose metric is missing neither raise nor clear the alert.
+        """
+        active = self.active[alert]
+        rows = np.flatnonzero(known)
+        slots, condition = slots[rows], condition[rows]
+        if not len(rows):
+            return rows
+        first = np.r_[True, slots[1:] != slots[:-1]]
+        previous = np.r_[False, condition[:-1]]
+        previous[first] = active[slots[first]]
+        last = np.r_[slots[1:] != slots[:-1], True]
+        active[slots[last]] = condition[last]
+        return rows[condition & ~previous]
+
+    def _advance(self, metric, slots, times, values):
+        """Feed one metric's readings (grouped by farm, in time order) into its running statistics.
+
+        Returns (count, EWMA, standard deviation, last value) of every
+        reading's farm just before that reading; NaN for missing readings.
+        """
+        priors = tuple(np.full(len(values), np.nan) for _ in range(4))
+        rows = np.flatnonzero(~np.isnan(values))
+        if not len(rows):
+            return priors
+        known = slots[rows]
+        starts = np.flatnonzero(np.r_[True, known[1:] != known[:-1]])
+        sizes = np.diff(np.r_[starts, len(known)])
+        rank = np.arange(len(known)) - np.repeat(starts, sizes)
+        # Blocks of READINGS_PER_BLOCK readings per farm, each still grouped by farm and in time order
+        rows = rows[np.argsort(rank // READINGS_PER_BLOCK, kind='stable')]
+        bounds = np.r_[0, np.cumsum(np.bincount(rank // READINGS_PER_BLOCK))]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            block = rows[start:stop]
+            before = self._advance_block(self.stats[metric], slots[block], times[block], values[block])
+            for prior, values_before in zip(priors, before):
+                prior[block] = values_before
+        return priors
+
+    def _advance_block(self, stats, slots, times, values):
+        """_advance for at most READINGS_PER_BLOCK readings per farm, as prefix sums over each farm's run.
+
+        Mean and M2 of the readings before each one are merged into the
+        saved ones with Chan's parallel form of Welford's update; the EWMA
+        recurrence is unrolled as a prefix sum scaled by powers of (1 - alpha).
+        """
+        first = np.r_[True, slots[1:] != slots[:-1]]
+        starts = np.flatnonzero(first)
+        farms = np.cumsum(first) - 1
+        ends = np.r_[starts[1:], len(slots)] - 1
+        position = np.arange(len(slots)) - starts[farms]
+        slot = slots[starts]
+        count0, mean0, m2_0 = stats['count'][slot], stats['mean'][slot], stats['m2'][slot]
+
+        def exclusive(column):
+            # Sum of the farm's earlier readings in the block
+            total = np.cumsum(column) - column
+            return total - total[starts][farms]
+
+        # Sums around the farm's first reading in the block keep the squares well conditioned
+        shift = values[starts]
+        deviation = values - shift[farms]
+        sums, squares = exclusive(deviation), exclusive(deviation * deviation)
+
+        def merged(count, sums, squares, farm):
+            """count, mean and M2 of the saved readings plus count block readings with these sums"""
+            block_count = np.maximum(count, 1)
+            block_mean = sums / block_count
+            delta = shift[farm] + block_mean - mean0[farm]
+            total = count0[farm] + count
+            mean = np.where(count > 0, mean0[farm] + delta * count / np.maximum(total, 1), mean0[farm])
+            m2 = np.where(count > 0, m2_0[farm] + squares - sums * block_mean
+                          + delta * delta * count0[farm] * count / np.maximum(total, 1), m2_0[farm])
+            return total, mean, m2
+
+        count, _, m2 = merged(position, sums, squares, farms)
+        std = np.sqrt(np.maximum(m2, 0) / np.maximum(count - 1, 1))
+
+        # EWMA after each reading: w^(k+1) * ewma0 + alpha * sum of w^(k-i) * x_i, w = 1 - alpha
+        alpha = self.ewma_alpha
+        decay = 1 - alpha
+        ewma0 = np.where(count0 > 0, stats['ewma'][slot], shift)
+        scaled = values * decay ** -position.astype('float64')
+        inclusive = np.cumsum(scaled)
+        inclusive -= (inclusive - scaled)[starts][farms]
+        ewma_after = decay ** position * (decay * ewma0[farms] + alpha * inclusive)
+        ewma = np.r_[np.nan, ewma_after[:-1]]
+        ewma[starts] = stats['ewma'][slot]
+        last = np.r_[np.nan, values[:-1]]
+        last[starts] = stats['last'][slot]
+        last_time = np.r_[0, times[:-1]]
+        last_time[starts] = stats['time'][slot]
+
+        # Rate of change per hour since the previous reading; 0 for a farm's first reading
+        hours = np.where(count > 0, (times - last_time) / _NS_PER_HOUR, np.inf)
+        rate = np.where(count > 0, values - last, 0.0) / hours
+
+        count_after, mean_after, m2_after = merged(position[ends] + 1, sums[ends] + deviation[ends],
+                                                   squares[ends] + deviation[ends] ** 2, np.arange(len(starts)))
+        stats['count'][slot] = count_after
+        stats['mean'][slot] = mean_after
+        stats['m2'][slot] = m2_after
+        stats['ewma'][slot] = ewma_after[ends]
+        stats['last'][slot] = values[ends]
+        stats['time'][slot] = times[ends]
+        stats['rate'][slot] = rate[ends]
+        return count, ewma, std, last
+
+    def _records(self, alert, metric, slots, times, values, limits):
+        farm_ids = np.asarray(self.farm_ids, dtype='int64')[slots]
+        return [
+            {'alert': alert, 'farm_id': int(farm_id), 'timestamp': timestamp, 'metric': metric,
+             'value': float(value), 'limit': float(limit)}
+            for farm_id, timestamp, value, limit in zip(farm_ids, _iso(times).tolist(), values.tolist(),
+                                                        limits.tolist())
+        ]
+
+    def snapshot(self, path=ALERT_STATE_FILE):
+        """Save the running state atomically, to be restored after a restart"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        state = {
+            'version': ALERT_STATE_VERSION,
+            'target': self.target,
+            'ewma_alpha': self.ewma_alpha,
+            'farm_ids': self.farm_ids,
+            'seen': self.seen.tolist(),
+            'stats': {metric: {name: values.tolist() for name, values in stats.items()}
+                      for metric, stats in self.stats.items()},
+            'active': {alert: flags.tolist() for alert, flags in self.active.items()}
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def restore(cls, path=ALERT_STATE_FILE, target=None):
+        """Engine with the state saved at path; a fresh one when there is none, or it belongs to another database"""
+        engine = cls(target)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return engine
+        if state.get('version') != ALERT_STATE_VERSION or state.get('target') != target:
+            return engine
+
+        engine.ewma_alpha = state['ewma_alpha']
+        engine.farm_ids = [int(farm_id) for farm_id in state['farm_ids']]
+        engine._slots = {farm_id: slot for slot, farm_id in enumerate(engine.farm_ids)}
+        size = len(engine.farm_ids)
+        engine.seen = np.asarray(state['seen'], dtype='int64')
+        for metric, stats in engine.stats.items():
+            saved = state['stats'].get(metric)
+            if saved is None:
+                engine.stats[metric] = cls._blank_stats(size)
+                continue
+            for name in _STATS:
+                stats[name] = np.asarray(saved[name], dtype=stats[name].dtype)
+        for alert in engine.active:
+            engine.active[alert] = np.asarray(state['active'].get(alert, [False] * size), dtype=bool)
+        return engine
+
+
+def append_alerts(alerts, path=ALERTS_FILE):
+    """Append alerts to the JSON-lines alert log"""
+    if not alerts:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        for alert in alerts:
+            f.write(json.dumps(alert) + '\n')
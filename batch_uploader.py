@@ -0,0 +1,371 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from retry_policy import RetryPolicy
+from sinks import as_sink
+from upload_errors import is_row_error
+
+# Upper bound on batches being sent at the same time, across all tables
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# UNIQUE(farm_id, timestamp) on every data table in create_tables.sql
+CONFLICT_COLUMNS = 'farm_id,timestamp'
+
+
+def iter_batches(data, batch_size):
+    """Yield consecutive slices of data with at most batch_size rows"""
+    for i in range(0, len(data), batch_size):
+        yield data[i:i+batch_size]
+
+
+def iter_sized_batches(data, sizer):
+    """Yield consecutive slices of data sized by an AdaptiveBatchSizer"""
+    sizer.measure_rows(data)
+    i = 0
+    while i < len(data):
+        size = sizer.next_size()
+        yield data[i:i+size]
+        i += size
+
+
+def new_table_stats():
+    """Counters kept for every table an uploader has seen"""
+    return {
+        'batches': 0,
+        'successful_batches': 0,
+        'failed_batches': 0,
+        'skipped_batches': 0,
+        'records': 0,
+        'retries': 0,
+        'dead_lettered_batches': 0,
+        'rejected_rows': 0,
+        'bisect_requests': 0
+    }
+
+
+class ConcurrentUploader:
+    """Upsert batches into several tables with a shared cap on in-flight requests.
+
+    client is a Supabase client or any sink from sinks.py (REST, Postgres
+    COPY, SQLite).
+
+    submit() blocks while max_in_flight batches are outstanding, so callers
+    never buffer more than that many batches. Batches of a table listed in
+    ordered_tables are sent one at a time, in submission order; list a table
+    there when the same (farm_id, timestamp) may appear in more than one
+    batch and the last row has to win. Other tables have no ordering
+    guarantee between batches.
+
+    When sizers has an AdaptiveBatchSizer for a table, the latency of every
+    attempt at a batch of that table is fed back to it.
+
+    With a retry_policy, transient failures are retried with backoff before a
+    batch counts as failed. Failed batches are appended to dead_letters (a
+    DeadLetterFile) when one is given, so they can be replayed later.
+
+    With rejects (a RejectedRowsFile), a batch that fails because of its
+    rows (bad value, constraint violation, too large) is bisected instead:
+    see _isolate. The bad rows go to rejects with the server's error, and
+    the batch counts as uploaded when the rest of it was stored; when every
+    row was rejected it counts as failed, without being dead-lettered. The
+    extra requests are counted as bisect_requests. Other errors fail the
+    batch as usual.
+
+    With stop_table_on_error, the first failed batch of a table stops every
+    later batch of that table (the old abort-the-table behaviour); otherwise
+    the failure is counted and the remaining batches still go out.
+
+    on_batch_done(table_name, batch, error) is called from an upload thread
+    once a sent batch succeeded (error None) or finally failed.
+
+    With metrics (a RunMetrics), every attempt's latency goes into the
+    table's request histogram and uploaded rows, batches, failures and
+    retries are counted per table, with rejected rows and bisect requests.
+    """
+
+    def __init__(self, client, max_in_flight=DEFAULT_MAX_IN_FLIGHT, ordered_tables=(),
+                 stop_table_on_error=True, on_conflict=CONFLICT_COLUMNS, sizers=None,
+                 retry_policy=None, dead_letters=None, rejects=None, verbose=True, on_batch_done=None,
+                 metrics=None):
+        self.client = client
+        self.sink = as_sink(client)
+        self.max_in_flight = max_in_flight
+        self.ordered_tables = set(ordered_tables)
+        self.stop_table_on_error = stop_table_on_error
+        self.on_conflict = on_conflict
+        self.verbose = verbose
+        self.sizers = sizers or {}
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1)
+        self.dead_letters = dead_letters
+        self.rejects = rejects
+        self.on_batch_done = on_batch_done
+        self.metrics = metrics
+        self.stats = {}
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='upload')
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+        self._failed_tables = set()
+        self._busy_tables = set()
+        self._waiting = {}
+        # First exception raised while finishing a batch (writing a dead letter, for instance)
+        self._error = None
+
+    def submit(self, table_name, batch):
+        """Queue one batch for upload, blocking while the in-flight limit is reached"""
+        self._slots.acquire()
+        with self._lock:
+            stats = self.stats.setdefault(table_name, new_table_stats())
+            stats['batches'] += 1
+            batch_num = stats['batches']
+            if self.stop_table_on_error and table_name in self._failed_tables:
+                stats['skipped_batches'] += 1
+                self._slots.release()
+                self._dead_letter(stats, table_name, batch, 'skipped after an earlier batch failed')
+                return
+            self._outstanding += 1
+            if table_name in self.ordered_tables:
+                if table_name in self._busy_tables:
+                    self._waiting.setdefault(table_name, deque()).append((batch_num, batch))
+                    return
+                self._busy_tables.add(table_name)
+        self._start(table_name, batch_num, batch)
+
+    def join(self):
+        """Wait for every submitted batch and return the per-table stats.
+
+        Raises the first exception the bookkeeping of a finished batch hit
+        (on_batch_done, writing dead letters or rejects), once every batch is done.
+        """
+        with self._idle:
+            while self._outstanding:
+                self._idle.wait()
+        if self._error is not None:
+            raise self._error
+        return self.stats
+
+    def close(self):
+        try:
+            self.join()
+        finally:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self, table_name, batch_num, batch):
+        future = self._executor.submit(self._send, table_name, batch)
+        future.add_done_callback(lambda f: self._finished(table_name, batch_num, batch, f))
+
+    def _dead_letter(self, stats, table_name, batch, error, attempts=1):
+        """Record a batch that won't be uploaded; call with self._lock held"""
+        if self.dead_letters is not None:
+            self.dead_letters.add(table_name, batch, error, attempts, self.on_conflict)
+            stats['dead_lettered_batches'] += 1
+
+    def _count(self, table_name, rows, error, attempts, isolated=None):
+        self.metrics.count('retries', table_name, attempts - 1)
+        if error is None:
+            self.metrics.count('batches', table_name)
+        else:
+            self.metrics.count('failed_batches', table_name)
+        self.metrics.count('rows', table_name, rows)
+        if isolated is not None:
+            self.metrics.count('retries', table_name, isolated['retries'])
+            self.metrics.count('rejected_rows', table_name, len(isolated['rejected']))
+            self.metrics.count('bisect_requests', table_name, isolated['requests'])
+
+    def _upsert(self, table_name, batch):
+        self.sink.upsert(table_name, batch, self.on_conflict)
+
+    def _attempt(self, table_name, rows, sizer=None):
+        """Upsert rows, retrying transient failures; returns (error or None, attempts)"""
+        metrics = self.metrics
+
+        def on_attempt(seconds, error):
+            if sizer:
+                sizer.record(len(rows), seconds, error)
+            if metrics is not None:
+                metrics.observe_latency(table_name, seconds)
+
+        _, error, attempts = self.retry_policy.call(lambda: self._upsert(table_name, rows), on_attempt)
+        return error, attempts
+
+    def _send(self, table_name, batch):
+        """Upsert one batch; returns (error or None, attempts, bisection outcome or None, first error)"""
+        error, attempts = self._attempt(table_name, batch, self.sizers.get(table_name))
+        if error is None or self.rejects is None or not is_row_error(error):
+            return error, attempts, None, error
+        isolated = {'stored': 0, 'rejected': [], 'failed': [], 'requests': 0, 'retries': 0}
+        self._isolate(table_name, batch, error, isolated)
+        # The batch fails when a part of it could not be stored, or when every row was
+        # rejected; rejected rows are accounted for either way, in rejects
+        if isolated['failed']:
+            return isolated['failed'][0][1], attempts, isolated, error
+        return (error if not isolated['stored'] else None), attempts, isolated, error
+
+    def _isolate(self, table_name, rows, error, isolated):
+        """Find the rows that made rows fail with a row error (is_row_error) by splitting it in halves.
+
+        Each half is sent on its own: one that uploads is stored, one that
+        fails with a row error is split again, down to single rows, which
+        are rejected with their error. A half that fails otherwise (after
+        retries) is kept in isolated['failed'] to be dead-lettered. k bad
+        rows in n cost at most 2k*log2(n) requests, sent one after another
+        from this batch's upload slot.
+        """
+        if len(rows) == 1:
+            isolated['rejected'].append((rows[0], error))
+            return
+        middle = len(rows) // 2
+        for part in (rows[:middle], rows[middle:]):
+            # Not fed to the batch sizer: these sizes are forced, not chosen
+            part_error, attempts = self._attempt(table_name, part)
+            isolated['requests'] += attempts
+            isolated['retries'] += attempts - 1
+            if part_error is None:
+                isolated['stored'] += len(part)
+            elif is_row_error(part_error):
+                self._isolate(table_name, part, part_error, isolated)
+            else:
+                isolated['failed'].append((part, part_error, attempts))
+
+    def _finished(self, table_name, batch_num, batch, future):
+        error = None
+        try:
+            error = self._record(table_name, batch_num, batch, future)
+        except Exception as e:
+            # A done callback's exception is only logged by concurrent.futures: join() raises it
+            error = e
+            with self._lock:
+                self._error = self._error or e
+        finally:
+            next_batch = self._release(table_name, error)
+        if next_batch is not None:
+            self._start(table_name, *next_batch)
+
+    def _record(self, table_name, batch_num, batch, future):
+        """Count, dead-letter and report a finished batch; returns its error or None"""
+        error, attempts, isolated, batch_error = future.result()
+        # Before the batch stops counting as outstanding, so join() waits for it
+        if self.on_batch_done is not None:
+            self.on_batch_done(table_name, batch, error)
+        with self._lock:
+            stats = self.stats[table_name]
+            stats['retries'] += attempts - 1
+            stored = len(batch) if error is None else 0
+            if isolated is not None:
+                stored = isolated['stored']
+                stats['retries'] += isolated['retries']
+                stats['rejected_rows'] += len(isolated['rejected'])
+                stats['bisect_requests'] += isolated['requests']
+                if isolated['rejected']:
+                    self.rejects.add(table_name, isolated['rejected'], self.on_conflict)
+            stats['records'] += stored
+            if error is None:
+                stats['successful_batches'] += 1
+            else:
+                stats['failed_batches'] += 1
+                self._failed_tables.add(table_name)
+                if isolated is None:
+                    self._dead_letter(stats, table_name, batch, error, attempts)
+                else:
+                    for part, part_error, part_attempts in isolated['failed']:
+                        self._dead_letter(stats, table_name, part, part_error, part_attempts)
+            if self.metrics is not None:
+                self._count(table_name, stored, error, attempts, isolated)
+
+        if self.verbose:
+            retried = f" after {attempts - 1} retries" if attempts > 1 else ""
+            if isolated is not None:
+                print(f"  ✂️  {table_name} batch {batch_num} bisected in {isolated['requests']} requests: "
+                      f"{isolated['stored']} records uploaded, {len(isolated['rejected'])} rejected, "
+                      f"{sum(len(part) for part, _, _ in isolated['failed'])} failed ({str(batch_error)})")
+            elif error is None:
+                print(f"  ✅ {table_name} batch {batch_num} uploaded ({len(batch)} records){retried}")
+            else:
+                print(f"  ❌ {table_name} batch {batch_num} failed{retried}: {str(error)}")
+        return error
+
+    def _release(self, table_name, error):
+        """Stop counting a finished batch as outstanding; returns the next batch of its table to start, if any.
+
+        Runs whatever happened to the batch's bookkeeping, so join() can't
+        wait forever on a slot that is never given back.
+        """
+        with self._lock:
+            next_batch = None
+            try:
+                if table_name in self.ordered_tables:
+                    waiting = self._waiting.get(table_name)
+                    skipped = []
+                    if waiting and error is not None and self.stop_table_on_error:
+                        skipped = list(waiting)
+                        waiting.clear()
+                        self._outstanding -= len(skipped)
+                        for _ in skipped:
+                            self._slots.release()
+                    if waiting:
+                        next_batch = waiting.popleft()
+                    else:
+                        self._busy_tables.discard(table_name)
+                    if skipped:
+                        stats = self.stats[table_name]
+                        stats['skipped_batches'] += len(skipped)
+                        for _, skipped_batch in skipped:
+                            self._dead_letter(stats, table_name, skipped_batch, 'skipped after an earlier batch failed')
+            except Exception as e:
+                self._error = self._error or e
+            finally:
+                self._outstanding -= 1
+                self._slots.release()
+                self._idle.notify_all()
+            return next_batch
+
+
+def upload_tables(client, payloads, batch_size=100, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                  ordered_tables=(), stop_table_on_error=True, sizers=None, retry_policy=None,
+                  dead_letters=None, rejects=None, verbose=True, on_conflict=CONFLICT_COLUMNS, metrics=None):
+    """Upload {table_name: records} concurrently and return per-table stats.
+
+    Batches are submitted round-robin across tables so every table makes
+    progress at the same time instead of one table after another. Tables
+    with an entry in sizers get adaptive batch sizes, the rest batch_size.
+    """
+    sizers = sizers or {}
+    with ConcurrentUploader(client, max_in_flight=max_in_flight, ordered_tables=ordered_tables,
+                            stop_table_on_error=stop_table_on_error, sizers=sizers,
+                            retry_policy=retry_policy, dead_letters=dead_letters, rejects=rejects,
+                            verbose=verbose, on_conflict=on_conflict, metrics=metrics) as uploader:
+        for table_name in payloads:
+            uploader.stats.setdefault(table_name, new_table_stats())
+
+        submit_round_robin(uploader, payloads, batch_size, sizers)
+        return uploader.join()
+
+
+def submit_round_robin(uploader, payloads, batch_size=100, sizers=None):
+    """Cut every table of payloads into batches and submit them round-robin"""
+    sizers = sizers or {}
+    iterators = {
+        name: iter_sized_batches(data, sizers[name]) if name in sizers else iter_batches(data, batch_size)
+        for name, data in payloads.items()
+    }
+    while iterators:
+        for table_name in list(iterators):
+            batch = next(iterators[table_name], None)
+            if batch is None:
+                del iterators[table_name]
+            else:
+                uploader.submit(table_name, batch)
+
+
+def table_succeeded(stats):
+    """True when every batch of a table was uploaded"""
+    return stats['successful_batches'] == stats['batches']
@@ -0,0 +1,73 @@
+"""Benchmark the bisection of failed batches: requests spent isolating k bad rows.
+
+Uploads the operational_data rows of FishAppData.csv to
+benchmarks/mock_postgrest.py with k rows set to aerator_status 2 (rejected by
+the CHECK constraint), for every --bad-rows and --batch-size value. Reports
+rows stored and rejected and the extra requests bisection sent, next to the
+2k*log2(batch size) bound, plus what the same failures cost without
+bisection.
+
+Usage:
+    python benchmarks/bench_bisect.py [--bad-rows 1 5 20] [--batch-size 100 1000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+
+import pandas as pd
+from supabase import create_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from batch_uploader import upload_tables
+from column_mapping import project_tables
+from dead_letters import RejectedRowsFile
+
+from mock_postgrest import MockPostgREST
+
+# Any JWT-shaped string is accepted by the mock
+BENCH_KEY = 'bench.bench.bench'
+
+
+def run(rows, batch_size, bisect, workdir):
+    rejects = RejectedRowsFile(os.path.join(workdir, 'rejects.jsonl')) if bisect else None
+    with MockPostgREST(latency=0.0) as mock:
+        stats = upload_tables(create_client(mock.url, BENCH_KEY), {'operational_data': rows}, batch_size=batch_size,
+                              stop_table_on_error=False, rejects=rejects, verbose=False)['operational_data']
+        stored = mock.row_counts().get('operational_data', 0)
+    return stored, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'FishAppData.csv'))
+    parser.add_argument('--bad-rows', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    farm_id_map = {name: i + 1 for i, name in enumerate(sorted(df['pond_id'].unique()))}
+    clean = project_tables(df, farm_id_map)['operational_data']
+    print(f"{len(clean)} operational_data rows")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for bad in args.bad_rows:
+            rows = [dict(row) for row in clean]
+            for i in random.Random(args.seed).sample(range(len(rows)), bad):
+                rows[i]['aerator_status'] = 2
+            for batch_size in args.batch_size:
+                stored, stats = run(rows, batch_size, True, workdir)
+                lost, _ = run(rows, batch_size, False, workdir)
+                bound = 2 * bad * math.ceil(math.log2(batch_size))
+                print(f"{bad:>3} bad rows, batches of {batch_size:>5}: {stored} stored, "
+                      f"{stats['rejected_rows']} rejected, {stats['bisect_requests']:>4} extra requests "
+                      f"(bound {bound:>4}, {stats['batches']} batches)  without bisection: "
+                      f"{len(rows) - lost} rows lost")
+
+
+if __name__ == '__main__':
+    main()
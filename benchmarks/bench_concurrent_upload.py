@@ -0,0 +1,71 @@
+"""Benchmark concurrent multi-table uploads against sequential batch uploads.
+
+Runs against benchmarks/mock_postgrest.py with injected per-request latency,
+so the numbers show how much round-trip time the concurrency hides.
+
+Usage:
+    python benchmarks/bench_concurrent_upload.py [--latency 0.05] [--in-flight 1 4 8 16]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from supabase import create_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_uploader import CONFLICT_COLUMNS, iter_batches, upload_tables
+from column_mapping import project_tables
+from mock_postgrest import MockPostgREST
+
+# Any JWT-shaped string is accepted by the mock
+BENCH_KEY = 'bench.bench.bench'
+
+
+def sequential_upload(client, payloads, batch_size):
+    """One table after another, one batch at a time (the old upload loop)"""
+    for table_name, data in payloads.items():
+        for batch in iter_batches(data, batch_size):
+            client.table(table_name).upsert(batch, on_conflict=CONFLICT_COLUMNS, returning='minimal').execute()
+
+
+def run(label, payloads, latency, upload):
+    with MockPostgREST(latency=latency) as mock:
+        client = create_client(mock.url, BENCH_KEY)
+        start = time.perf_counter()
+        upload(client)
+        elapsed = time.perf_counter() - start
+        counts = mock.row_counts()
+        requests = sum(mock.requests.values())
+        peak = mock.max_in_flight
+    rows = sum(len(data) for data in payloads.values())
+    print(f"{label:<22} {elapsed:8.2f}s  {rows / elapsed:10,.0f} rows/sec  "
+          f"{requests:5d} requests  peak in-flight {peak:3d}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default='FishAppData.csv')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    farm_id_map = {name: i + 1 for i, name in enumerate(sorted(df['pond_id'].unique()))}
+    payloads = project_tables(df, farm_id_map)
+
+    print(f"Rows per table: {len(df)}, batch size {args.batch_size}, latency {args.latency * 1000:.0f} ms")
+    expected = run('sequential', payloads, args.latency,
+                   lambda client: sequential_upload(client, payloads, args.batch_size))
+    for max_in_flight in args.in_flight:
+        counts = run(f"concurrent x{max_in_flight}", payloads, args.latency,
+                     lambda client: upload_tables(client, payloads, batch_size=args.batch_size,
+                                                  max_in_flight=max_in_flight, verbose=False))
+        assert counts == expected, f"row counts differ: {counts} != {expected}"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark `fishapp ingest --dir` with different numbers of parser processes.
+
+Builds a directory of per-farm, per-day CSVs (FishAppData.csv shifted by one
+day per copy, split by farm and day, as the field loggers drop them) and, for
+each --workers value, times parsing alone (directory_ingest.parse_files) and
+the whole ingest against benchmarks/mock_postgrest.py, each in a fresh
+process. Parsing should scale with the workers up to the cores available;
+the whole ingest up to the limit of the upload sink.
+
+Usage:
+    python benchmarks/bench_directory_ingest.py [--days 20] [--workers 1 2 4] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pond_data_generator import csv_timestamp_labels
+from timestamp_parsing import parse_timestamps
+
+from mock_postgrest import MockPostgREST
+
+# Any JWT-shaped string is accepted by the mock
+BENCH_KEY = 'bench.bench.bench'
+
+
+def daily_files(csv_path, days, directory):
+    """Write days copies of csv_path, one day apart, as one file per farm and day; returns rows written"""
+    df = pd.read_csv(csv_path)
+    timestamps = parse_timestamps(df['timestamp'])
+    rows = 0
+    for day in range(days):
+        shifted = timestamps + pd.Timedelta(days=day)
+        copy = df.assign(timestamp=csv_timestamp_labels(shifted))
+        for (farm, date), part in copy.groupby([copy['pond_id'], shifted.dt.date.to_numpy()]):
+            part.to_csv(os.path.join(directory, f"{farm.replace(' ', '_')}_{date}.csv"), index=False)
+            rows += len(part)
+    return rows
+
+
+def run_parse(directory, workers):
+    """Child process: seconds to parse every file with workers processes"""
+    from directory_ingest import discover_files, parse_files
+    start = time.perf_counter()
+    for _ in parse_files(discover_files(directory), workers):
+        pass
+    return time.perf_counter() - start
+
+
+def run_ingest(directory, url, workers, workdir):
+    """Child process: seconds of one `fishapp ingest --dir` run"""
+    os.chdir(workdir)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import fishapp
+        import supabase_relational_upload as pipeline
+        from supabase import create_client
+        pipeline.supabase = create_client(url, BENCH_KEY)
+        start = time.perf_counter()
+        fishapp.main(['ingest', '--dir', directory, '--workers', str(workers), '--reingest', '--no-alerts',
+                      '--metrics-textfile', '', '--summary-json', ''])
+        return time.perf_counter() - start
+
+
+def in_child(function, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(function, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'FishAppData.csv'))
+    parser.add_argument('--days', type=int, default=20, help='days of files per farm')
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the mock waits per request')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        directory = os.path.join(workdir, 'drops')
+        os.makedirs(directory)
+        rows = daily_files(args.csv, args.days, directory)
+        print(f"{len(os.listdir(directory))} files, {rows} rows, {os.cpu_count()} CPUs")
+
+        baseline = {}
+        for workers in args.workers:
+            parse_seconds = in_child(run_parse, directory, workers)
+            with MockPostgREST(latency=args.latency, jitter=args.jitter, seed=0) as mock:
+                ingest_seconds = in_child(run_ingest, directory, mock.url, workers, workdir)
+                stored = mock.row_counts().get('sensor_readings', 0)
+            baseline.setdefault('parse', parse_seconds)
+            baseline.setdefault('ingest', ingest_seconds)
+            print(f"workers {workers:>2}: parse {parse_seconds:6.2f}s ({baseline['parse'] / parse_seconds:4.2f}x, "
+                  f"{rows / parse_seconds:9,.0f} rows/s)  ingest {ingest_seconds:6.2f}s "
+                  f"({baseline['ingest'] / ingest_seconds:4.2f}x, {rows / ingest_seconds:8,.0f} rows/s)  "
+                  f"{stored} sensor rows stored")
+
+
+if __name__ == '__main__':
+    main()
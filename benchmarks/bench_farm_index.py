@@ -0,0 +1,124 @@
+"""Benchmark the farm grid index (nearest farm, bounding boxes) against brute-force numpy scans.
+
+Farms are scattered in clusters around the real farm coordinates; probe
+readings are drawn near random farms, like mobile probes moving between
+ponds.
+
+Usage:
+    python benchmarks/bench_farm_index.py [--farms 10000 100000] [--queries 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from farm_locations import FarmIndex, add_coordinates
+from pond_data_generator import pond_name
+
+# Centre of the farms in Coordenadas_Granjas.xlsx
+CENTRE = (17.43, -93.455)
+
+
+def farm_catalog(count, rng):
+    """count farms in clusters of ~50 within about 100 km of CENTRE"""
+    clusters = max(count // 50, 1)
+    centres = np.column_stack([CENTRE[0] + rng.uniform(-0.5, 0.5, clusters),
+                               CENTRE[1] + rng.uniform(-0.5, 0.5, clusters)])
+    members = rng.integers(0, clusters, count)
+    latitudes = centres[members, 0] + rng.normal(0, 0.01, count)
+    longitudes = centres[members, 1] + rng.normal(0, 0.01, count)
+    return np.array([pond_name(i) for i in range(count)], dtype=object), latitudes, longitudes
+
+
+def brute_nearest(latitudes, longitudes, query_latitudes, query_longitudes, scale, chunk=256):
+    """Index of the nearest farm of every query by scanning all farms"""
+    nearest = np.empty(len(query_latitudes), dtype='int64')
+    for start in range(0, len(query_latitudes), chunk):
+        dx = (longitudes[None] - query_longitudes[start:start + chunk, None]) * scale
+        dy = latitudes[None] - query_latitudes[start:start + chunk, None]
+        nearest[start:start + chunk] = np.argmin(dx * dx + dy * dy, axis=1)
+    return nearest
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench(count, queries, boxes, brute_queries, rng):
+    names, latitudes, longitudes = farm_catalog(count, rng)
+    build_time, index = timed(lambda: FarmIndex(names, latitudes, longitudes))
+
+    near = rng.integers(0, count, queries)
+    query_latitudes = latitudes[near] + rng.normal(0, 0.005, queries)
+    query_longitudes = longitudes[near] + rng.normal(0, 0.005, queries)
+    index_time, (positions, _) = timed(lambda: index.nearest(query_latitudes, query_longitudes))
+
+    # Brute force on a sample, scaled up to the full query count
+    sample = slice(0, min(brute_queries, queries))
+    brute_time, brute = timed(lambda: brute_nearest(latitudes, longitudes, query_latitudes[sample],
+                                                    query_longitudes[sample], index._scale))
+    brute_time *= queries / len(brute)
+    mismatches = int((positions[sample] != brute).sum())
+
+    # Map-view boxes of roughly 5 x 5 km
+    corners = rng.integers(0, count, boxes)
+    box_latitudes, box_longitudes = latitudes[corners] - 0.02, longitudes[corners] - 0.02
+    box_time, (box_numbers, positions_in_boxes) = timed(lambda: index.within_boxes(
+        box_latitudes, box_longitudes, box_latitudes + 0.045, box_longitudes + 0.045))
+    found = np.split(positions_in_boxes, np.searchsorted(box_numbers, np.arange(1, boxes)))
+    single_time, _ = timed(lambda: [index.within(lat, lon, lat + 0.045, lon + 0.045)
+                                    for lat, lon in zip(box_latitudes, box_longitudes)])
+    scan_time, scanned = timed(lambda: [np.flatnonzero((latitudes >= lat) & (latitudes <= lat + 0.045) &
+                                                       (longitudes >= lon) & (longitudes <= lon + 0.045))
+                                        for lat, lon in zip(box_latitudes, box_longitudes)])
+    box_mismatches = sum(not np.array_equal(a, b) for a, b in zip(found, scanned))
+
+    print(f"\n{count:,} farms (grid {index._nx} x {index._ny}, built in {build_time * 1000:.1f} ms)")
+    print(f"  nearest farm, {queries:,} points : index {index_time * 1000:8.1f} ms   "
+          f"brute force {brute_time * 1000:9.1f} ms   {brute_time / index_time:6.1f}x   "
+          f"({mismatches} mismatches in {len(brute):,} checked)")
+    print(f"  bounding box, {boxes:,} queries   : index {box_time * 1000:8.1f} ms   "
+          f"full scan   {scan_time * 1000:9.1f} ms   {scan_time / box_time:6.1f}x   "
+          f"({box_mismatches} mismatches, {np.mean([len(f) for f in found]):.1f} farms per box; "
+          f"one box per call {single_time * 1000:.1f} ms)")
+
+
+def bench_assignment(rows, rng):
+    """Coordinates per reading: per-row lambda over a dict against one Series.map per column"""
+    names, latitudes, longitudes = farm_catalog(15, rng)
+    farms = pd.DataFrame({'pond_id': names, 'latitude': latitudes, 'longitude': longitudes})
+    data = pd.DataFrame({'pond_id': rng.choice(names, rows)})
+    coord_mapping = farms.set_index('pond_id').to_dict('index')
+    lambda_time, _ = timed(lambda: (
+        data['pond_id'].map(lambda x: coord_mapping.get(x, {}).get('latitude', 0.0)),
+        data['pond_id'].map(lambda x: coord_mapping.get(x, {}).get('longitude', 0.0))))
+    mapped_time, _ = timed(lambda: add_coordinates(data.copy(), farms))
+    print(f"\nCoordinates for {rows:,} readings: per-row lambda {lambda_time * 1000:.1f} ms   "
+          f"add_coordinates {mapped_time * 1000:.1f} ms   {lambda_time / mapped_time:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--farms', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=100000, help='probe readings to assign')
+    parser.add_argument('--boxes', type=int, default=1000, help='bounding-box queries')
+    parser.add_argument('--brute-queries', type=int, default=5000,
+                        help='queries checked (and timed) with the brute-force scan')
+    parser.add_argument('--readings', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for count in args.farms:
+        bench(count, args.queries, args.boxes, args.brute_queries, rng)
+    bench_assignment(args.readings, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark `fishapp ingest --follow`: ingest-to-commit latency of a live CSV feed.
+
+A writer thread appends FishAppData.csv rows to a file at --rate rows per
+second while the follower uploads them to benchmarks/mock_postgrest.py, once
+for every --max-delay value. Reports p50/p99 latency from a row being read
+to its offset being committed, and the requests sent, so the latency/request
+trade-off of the micro-batch settings is visible.
+
+Usage:
+    python benchmarks/bench_follow.py [--rate 200] [--seconds 10] [--max-delay 0.25 1 2] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from mock_postgrest import MockPostgREST
+
+# Any JWT-shaped string is accepted by the mock
+BENCH_KEY = 'bench.bench.bench'
+
+# Appends per second made by the writer
+WRITES_PER_SECOND = 20
+
+
+def append_rows(path, header, rows, rate, seconds):
+    """Append rows to path at rate rows/s for seconds (cycling through rows); returns rows written"""
+    per_write = max(1, round(rate / WRITES_PER_SECOND))
+    written = 0
+    start = time.perf_counter()
+    with open(path, 'wb') as f:
+        f.write(header)
+        while time.perf_counter() - start < seconds:
+            part = [rows[(written + i) % len(rows)] for i in range(per_write)]
+            f.write(b''.join(part))
+            f.flush()
+            written += per_write
+            time.sleep(max(0.0, start + written / rate - time.perf_counter()))
+    return written
+
+
+def run(args, max_delay, workdir):
+    import fishapp
+    import supabase_relational_upload as pipeline
+    from supabase import create_client
+
+    with open(args.csv, 'rb') as f:
+        header, *rows = f.read().splitlines(keepends=True)
+    path = os.path.join(workdir, f'live_{max_delay}.csv')
+    open(path, 'wb').close()
+    with MockPostgREST(latency=args.latency, jitter=args.jitter, seed=0) as mock:
+        pipeline.supabase = create_client(mock.url, BENCH_KEY)
+        pipeline.registry = None
+        written = {}
+        writer = threading.Thread(target=lambda: written.setdefault(
+            'rows', append_rows(path, header, rows, args.rate, args.seconds)))
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            writer.start()
+            fishapp.main(['ingest', '--follow', '--csv', path, '--max-delay', str(max_delay),
+                          '--max-batch-rows', str(args.max_batch_rows), '--idle-exit', '1', '--no-alerts',
+                          '--metrics-textfile', '', '--summary-json', os.path.join(workdir, 'summary.json')])
+        writer.join()
+        requests = sum(count for (method, table), count in mock.requests.items() if method == 'POST')
+
+    with open(os.path.join(workdir, 'summary.json')) as f:
+        latency = json.load(f)['commit_latency_seconds']
+    print(f"max delay {max_delay:5.2f}s: {latency['rows']:>6} of {written['rows']} rows committed  "
+          f"p50 {latency['p50'] * 1000:6.0f} ms  p99 {latency['p99'] * 1000:6.0f} ms  {requests} upsert requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'FishAppData.csv'))
+    parser.add_argument('--rate', type=float, default=200, help='rows appended per second')
+    parser.add_argument('--seconds', type=float, default=10, help='how long the writer runs')
+    parser.add_argument('--max-delay', type=float, nargs='+', default=[0.25, 1.0, 2.0])
+    parser.add_argument('--max-batch-rows', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the mock waits per request')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for max_delay in args.max_delay:
+            run(args, max_delay, workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark loading a source CSV from the columnar frame cache against parsing it.
+
+Usage:
+    python benchmarks/bench_frame_cache.py [--csv FishAppData.csv] [--repeat 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_cache import read_csv_cached
+
+
+def best_of(func, rounds):
+    """Best wall-clock time of func() over a few rounds"""
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default='FishAppData.csv')
+    parser.add_argument('--repeat', type=int, default=10, help='concatenate the CSV this many times')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'source.csv')
+        cache_dir = os.path.join(workdir, 'frames')
+        df = pd.read_csv(args.csv)
+        pd.concat([df] * args.repeat, ignore_index=True).to_csv(csv_path, index=False)
+        size = os.path.getsize(csv_path)
+
+        parse_time, parsed = best_of(lambda: pd.read_csv(csv_path), args.rounds)
+        build_time, _ = best_of(lambda: read_csv_cached(csv_path, cache_dir=cache_dir), 1)
+        cached_time, cached = best_of(lambda: read_csv_cached(csv_path, cache_dir=cache_dir), args.rounds)
+        pd.testing.assert_frame_equal(parsed, cached)
+
+    print(f"Rows: {len(parsed)} ({size / 1e6:.1f} MB)")
+    print(f"pd.read_csv()         : {parse_time * 1000:8.1f} ms")
+    print(f"first cached read     : {build_time * 1000:8.1f} ms  (parse + write cache)")
+    print(f"warm cached read      : {cached_time * 1000:8.1f} ms")
+    print(f"Speed-up              : {parse_time / cached_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
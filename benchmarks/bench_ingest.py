@@ -0,0 +1,207 @@
+"""Benchmark every stage of supabase_relational_upload.py against a local PostgREST stand-in.
+
+Each dataset size (multiples of FishAppData.csv, timestamps shifted so every
+copy is new data) runs in a fresh process against benchmarks/mock_postgrest.py
+with the given latency and error injection. Per-stage seconds, rows/sec,
+peak RSS and request counts are written to a JSON file; --compare prints
+the change against an earlier result file.
+
+Usage:
+    python benchmarks/bench_ingest.py [--scales 1 10 100] [--latency 0.02] [--error-rate 0.01]
+    python benchmarks/bench_ingest.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pond_data_generator import csv_timestamp_labels
+from timestamp_parsing import parse_timestamps
+
+from mock_postgrest import MockPostgREST
+
+# Any JWT-shaped string is accepted by the mock
+BENCH_KEY = 'bench.bench.bench'
+
+STAGES = ('csv_load', 'farm_upsert', 'payload_prep', 'upsert_batches')
+
+
+def scaled_csv(csv_path, scale, path):
+    """Write csv_path repeated scale times, each copy shifted past the previous one in time"""
+    df = pd.read_csv(csv_path)
+    timestamps = parse_timestamps(df['timestamp'])
+    span = (timestamps.max() - timestamps.min()).ceil('D') + pd.Timedelta(days=1)
+    copies = []
+    for copy in range(scale):
+        shifted = df.copy()
+        shifted['timestamp'] = csv_timestamp_labels(timestamps + copy * span)
+        copies.append(shifted)
+    pd.concat(copies, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_pipeline(csv_path, url, max_in_flight, workdir, compress=False):
+    """Child process: run the upload stages once and time each of them"""
+    os.chdir(workdir)
+    stages = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import supabase_relational_upload as pipeline
+        from sensor_frames import bytes_per_row
+        from sinks import RestSink
+        from supabase import create_client
+        pipeline.supabase = create_client(url, BENCH_KEY)
+        pipeline.sink = RestSink(pipeline.supabase, compress=compress)
+        baseline_rss = peak_rss_mb()
+
+        start = time.perf_counter()
+        df = pipeline.load_data(csv_path, use_cache=False)
+        stages['csv_load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        farm_id_map = pipeline.upload_farms(pipeline.prepare_farm_data(df))
+        stages['farm_upsert'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        payloads = pipeline.prepare_table_data(df, farm_id_map)
+        stages['payload_prep'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = pipeline.upload_all_tables(payloads, max_in_flight=max_in_flight)
+        stages['upsert_batches'] = time.perf_counter() - start
+
+    return {
+        'rows': len(df),
+        # In-memory frame size: compact as loaded, and as pd.read_csv would have held it
+        'bytes_per_row': float(bytes_per_row(df)),
+        'source_bytes_per_row': df.attrs.get('source_bytes_per_row'),
+        'records': sum(len(records) for records in payloads.values()),
+        'tables_succeeded': sum(1 for success in results.values() if success),
+        'stages': stages,
+        'import_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_scale(csv_path, scale, args):
+    """Build the scaled dataset, serve a fresh mock and run the pipeline in a new process"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = scaled_csv(csv_path, scale, os.path.join(workdir, f'scale_{scale}.csv'))
+        with MockPostgREST(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=0) as mock:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(run_pipeline, path, mock.url, args.max_in_flight, workdir, args.gzip).result()
+            requests = {f"{method} {table}": count for (method, table), count in sorted(mock.requests.items())}
+            body_bytes = sum(mock.body_bytes.values())
+            stored = mock.row_counts()
+
+    total = sum(result['stages'].values())
+    result.update({
+        'scale': scale,
+        'total_seconds': total,
+        'rows_per_second': result['rows'] / total,
+        'stage_rows_per_second': {stage: result['rows'] / seconds
+                                  for stage, seconds in result['stages'].items() if seconds},
+        'requests': requests,
+        'total_requests': sum(requests.values()),
+        'request_body_bytes': body_bytes,
+        'stored_rows': stored
+    })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result):
+    stages = '  '.join(f"{stage} {result['stages'][stage]:7.3f}s" for stage in STAGES)
+    print(f"{result['scale']:>4}x {result['rows']:>8} rows  {stages}  total {result['total_seconds']:7.3f}s  "
+          f"{result['rows_per_second']:10,.0f} rows/s  peak RSS {result['peak_rss_mb']:7.1f} MB  "
+          f"frame {result['bytes_per_row']:.0f} B/row  "
+          f"{result['total_requests']:5d} requests  {result['request_body_bytes'] / 2**20:7.1f} MiB sent")
+
+
+def print_comparison(results, baseline):
+    """Per-stage time of this run relative to a baseline result file (<1.00x is faster)"""
+    previous = {result['scale']: result for result in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        before = previous.get(result['scale'])
+        if before is None:
+            continue
+        ratios = '  '.join(f"{stage} {result['stages'][stage] / before['stages'][stage]:5.2f}x"
+                           for stage in STAGES if before['stages'].get(stage))
+        print(f"{result['scale']:>4}x  {ratios}  total {result['total_seconds'] / before['total_seconds']:5.2f}x  "
+              f"peak RSS {result['peak_rss_mb'] - before['peak_rss_mb']:+.1f} MB  "
+              f"requests {result['total_requests'] - before['total_requests']:+d}"
+              + (f"  bytes sent {result['request_body_bytes'] / before['request_body_bytes']:5.2f}x"
+                 if before.get('request_body_bytes') else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'FishAppData.csv'))
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    parser.add_argument('--gzip', action='store_true', help='gzip the request bodies')
+    parser.add_argument('--output', default='bench_ingest.json', help='machine-readable results')
+    parser.add_argument('--compare', help='earlier --output file to compare against')
+    args = parser.parse_args()
+
+    csv_path = os.path.abspath(args.csv)
+    results = []
+    for scale in args.scales:
+        result = run_scale(csv_path, scale, args)
+        print_result(result)
+        results.append(result)
+
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'config': {
+            'csv': os.path.basename(csv_path),
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate,
+            'max_in_flight': args.max_in_flight,
+            'gzip': args.gzip
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
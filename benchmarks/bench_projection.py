@@ -0,0 +1,116 @@
+"""Benchmark the vectorized payload projector against the old iterrows() loops.
+
+Usage:
+    python benchmarks/bench_projection.py [--csv FishAppData.csv] [--repeat 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from column_mapping import DECIMAL_COLUMNS, project_tables
+
+
+def legacy_prepare(df, farm_id_map):
+    """The three per-row loops the upload scripts used before column_mapping"""
+    sensor_data = []
+    for _, row in df.iterrows():
+        farm_id = farm_id_map.get(row['pond_id'])
+        if farm_id:
+            sensor_data.append({
+                'farm_id': farm_id,
+                'timestamp': row['timestamp'],
+                'dissolved_oxygen': float(row['OD_mg_L']),
+                'temperature': float(row['Temp_C']),
+                'ph': float(row['pH']),
+                'conductivity': float(row['Conductivity_uScm']),
+                'par': float(row['PAR_umol_m2s']),
+                'ammonia': float(row['Ammonia_mg_L']),
+                'nitrite': float(row['Nitrite_mg_L']),
+                'turbidity': float(row['Turbidity_NTU']),
+                'chlorophyll': float(row['Chlorophyll_ug_L'])
+            })
+
+    weather_data = []
+    for _, row in df.iterrows():
+        farm_id = farm_id_map.get(row['pond_id'])
+        if farm_id:
+            weather_data.append({
+                'farm_id': farm_id,
+                'timestamp': row['timestamp'],
+                'air_pressure': float(row['AirPressure_hPa']),
+                'wind_speed': float(row['Wind_m_s']),
+                'rainfall': float(row['Rain_mm'])
+            })
+
+    operational_data = []
+    for _, row in df.iterrows():
+        farm_id = farm_id_map.get(row['pond_id'])
+        if farm_id:
+            operational_data.append({
+                'farm_id': farm_id,
+                'timestamp': row['timestamp'],
+                'flow_rate': float(row['Flow_m3_h']),
+                'lirio_coverage': float(row['Lirio_Coverage_pct']),
+                'aerator_status': int(row['Aerator_Status'])
+            })
+
+    return {
+        'sensor_readings': sensor_data,
+        'weather_data': weather_data,
+        'operational_data': operational_data
+    }
+
+
+def round_to_scale(records):
+    """records with DECIMAL columns rounded to their scale, as project_tables sends them"""
+    if not records:
+        return records
+    columns = {column: np.array([row[column] for row in records]).round(DECIMAL_COLUMNS[column][1]).tolist()
+               for column in records[0] if column in DECIMAL_COLUMNS}
+    return [{**row, **{column: values[i] for column, values in columns.items()}} for i, row in enumerate(records)]
+
+
+def best_of(func, rounds):
+    """Best wall-clock time of func() over a few rounds"""
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default='FishAppData.csv')
+    parser.add_argument('--repeat', type=int, default=10, help='concatenate the CSV this many times')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    df = pd.concat([df] * args.repeat, ignore_index=True)
+    farm_id_map = {name: i + 1 for i, name in enumerate(sorted(df['pond_id'].unique()))}
+    rows = len(df)
+
+    legacy_time, legacy = best_of(lambda: legacy_prepare(df, farm_id_map), args.rounds)
+    projected_time, projected = best_of(lambda: project_tables(df, farm_id_map), args.rounds)
+
+    # The old loops sent full float precision; the database keeps only each DECIMAL's scale
+    for table_name in legacy:
+        assert round_to_scale(legacy[table_name]) == projected[table_name], f"payload mismatch in {table_name}"
+
+    print(f"Rows: {rows}")
+    print(f"iterrows() loops : {legacy_time:8.3f}s  {rows / legacy_time:12,.0f} rows/sec")
+    print(f"project_tables() : {projected_time:8.3f}s  {rows / projected_time:12,.0f} rows/sec")
+    print(f"Speed-up         : {legacy_time / projected_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark fishapp's cold start and fail when it is over the time budget.
+
+Each command runs in a fresh interpreter (best of --rounds). Also checks that
+importing the upload modules prints nothing and that `import fishapp` loads
+none of the heavy dependencies.
+
+Usage:
+    python benchmarks/bench_startup.py [--rounds 5] [--budget 0.2]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Commands that must start within the budget; anything else may import pandas
+FAST_COMMANDS = {
+    'fishapp --help': ['fishapp.py', '--help'],
+    'fishapp schema': ['fishapp.py', 'schema']
+}
+
+# Seconds allowed for each of FAST_COMMANDS, interpreter start-up included
+DEFAULT_BUDGET = 0.2
+
+HEAVY_MODULES = ('pandas', 'numpy', 'supabase', 'httpx', 'postgrest')
+
+# Importing these must not load data, print or talk to the network
+QUIET_MODULES = ('supabase_relational_upload', 'upload_data_only', 'supabase_upload_corrected',
+                 'corrected_notebook_code', 'fishapp')
+
+
+def run(args):
+    """Wall-clock seconds of one `python args...` in the repository"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=REPO_ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def python_output(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='seconds allowed per fast command')
+    args = parser.parse_args()
+
+    failures = []
+    baseline = min(run(['-c', 'pass']) for _ in range(args.rounds))
+    print(f"python -c pass            : {baseline * 1000:7.1f} ms")
+    for name, command in FAST_COMMANDS.items():
+        best = min(run(command) for _ in range(args.rounds))
+        status = 'ok' if best <= args.budget else 'OVER BUDGET'
+        print(f"{name:<26}: {best * 1000:7.1f} ms  (budget {args.budget * 1000:.0f} ms) {status}")
+        if best > args.budget:
+            failures.append(f"{name} took {best * 1000:.0f} ms")
+
+    loaded = python_output(f"import sys, fishapp; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    print(f"import fishapp loads      : {loaded.strip() or 'no heavy modules'}")
+    if loaded.strip():
+        failures.append(f"import fishapp loads {loaded.strip()}")
+
+    for module in QUIET_MODULES:
+        output = python_output(f"import {module}")
+        if output:
+            failures.append(f"import {module} printed {len(output.splitlines())} lines")
+    print(f"silent imports            : {', '.join(QUIET_MODULES)}")
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    print("\n✅ Start-up within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""Local stand-in for the Supabase REST (PostgREST) endpoints used by the upload scripts.
+
+It keeps tables in memory, honours on_conflict upserts and can inject latency
+and server errors, so upload benchmarks measure the client and not the network.
+Request bodies may be gzip-compressed (Content-Encoding: gzip) unless
+accept_gzip is off, in which case they are refused with 415.
+
+Usage:
+    python benchmarks/mock_postgrest.py --port 54321 --latency 0.05
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockPostgREST:
+    """In-memory PostgREST with configurable latency and error injection"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0,
+                 accept_gzip=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.accept_gzip = accept_gzip
+        self.random = random.Random(seed)
+        self.tables = {}
+        self.requests = Counter()
+        # Request body bytes received per table, as sent (compressed or not)
+        self.body_bytes = Counter()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                mock._handle(self, 'GET')
+
+            def do_POST(self):
+                mock._handle(self, 'POST')
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def row_counts(self):
+        """Number of stored rows per table"""
+        with self.lock:
+            return {name: len(rows) for name, rows in self.tables.items()}
+
+    def _sleep(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reply(self, handler, status, payload=None, headers=None):
+        body = b'' if payload is None else json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler, method):
+        parsed = urlparse(handler.path)
+        table = parsed.path.rsplit('/', 1)[-1]
+        params = parse_qs(parsed.query)
+        body = None
+        if method == 'POST':
+            length = int(handler.headers.get('Content-Length') or 0)
+            body = handler.rfile.read(length)
+        encoding = handler.headers.get('Content-Encoding', '').lower()
+
+        with self.lock:
+            self.requests[(method, table)] += 1
+            if body:
+                self.body_bytes[table] += len(body)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.error_rate and self.random.random() < self.error_rate
+        try:
+            self._sleep()
+            if fail:
+                self._reply(handler, 503, {'message': 'injected failure', 'code': '503'})
+            elif encoding and (encoding != 'gzip' or not self.accept_gzip):
+                self._reply(handler, 415, {'message': f'unsupported Content-Encoding {encoding}', 'code': '415'})
+            elif method == 'GET':
+                with self.lock:
+                    rows = list(self.tables.get(table, {}).values())
+                result, total = self._query(rows, params)
+                headers = None
+                if 'count=exact' in handler.headers.get('Prefer', ''):
+                    headers = {'Content-Range': f"0-{len(result) - 1}/{total}" if result else f"*/{total}"}
+                self._reply(handler, 200, result, headers)
+            else:
+                rows = json.loads(gzip.decompress(body) if encoding else body)
+                if isinstance(rows, dict):
+                    rows = [rows]
+                rejected = self._check_violation(rows)
+                if rejected:
+                    self._reply(handler, 400, rejected)
+                    return
+                conflict = params.get('on_conflict', [''])[0]
+                stored = self._upsert(table, rows, conflict.split(',') if conflict else None)
+                prefer = handler.headers.get('Prefer', '')
+                self._reply(handler, 201, None if 'return=minimal' in prefer else stored)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def _check_violation(rows):
+        """Reject the whole request like Postgres does when one row breaks a CHECK"""
+        for row in rows:
+            if 'aerator_status' in row and row['aerator_status'] not in (0, 1, None):
+                return {
+                    'code': '23514',
+                    'message': 'new row violates check constraint "operational_data_aerator_status_check"',
+                    'details': f"Failing row contains aerator_status={row['aerator_status']}.",
+                    'hint': None
+                }
+        return None
+
+    _OPERATORS = {
+        'eq': lambda a, b: a == b,
+        'gt': lambda a, b: a > b,
+        'gte': lambda a, b: a >= b,
+        'lt': lambda a, b: a < b,
+        'lte': lambda a, b: a <= b,
+        'in': lambda a, b: a in b
+    }
+
+    @staticmethod
+    def _matches(value, compare, operand):
+        if value is None:
+            return False
+        numeric = isinstance(value, (int, float))
+        if operand.startswith('('):
+            # in.(a,b,c)
+            items = [item.strip().strip('"') for item in operand[1:-1].split(',')]
+            return compare(value, [float(item) for item in items]) if numeric else compare(str(value), items)
+        return compare(value, float(operand)) if numeric else compare(str(value), operand)
+
+    def _query(self, rows, params):
+        """Apply the eq/gt/gte/lt/lte/in filters, order, offset, limit and select of a GET.
+
+        Returns (rows, number of rows matching the filters).
+        """
+        for column, values in params.items():
+            if column in ('select', 'order', 'limit', 'offset'):
+                continue
+            # A column can be filtered more than once (bucket=gte.a&bucket=lte.b)
+            for value in values:
+                operator, _, operand = value.partition('.')
+                compare = self._OPERATORS.get(operator)
+                if compare is not None:
+                    rows = [row for row in rows if self._matches(row.get(column), compare, operand)]
+        if 'order' in params:
+            column, _, direction = params['order'][0].partition('.')
+            descending = direction.startswith('desc')
+            present = sorted((row for row in rows if row.get(column) is not None),
+                             key=lambda row: row[column], reverse=descending)
+            missing = [row for row in rows if row.get(column) is None]
+            # Postgres puts NULLs last ascending and first descending unless told otherwise
+            nulls_first = 'nullsfirst' in direction or (descending and 'nullslast' not in direction)
+            rows = missing + present if nulls_first else present + missing
+        total = len(rows)
+        if 'offset' in params:
+            rows = rows[int(params['offset'][0]):]
+        if 'limit' in params:
+            rows = rows[:int(params['limit'][0])]
+        select = params.get('select', ['*'])[0]
+        if select != '*':
+            columns = [column.strip() for column in select.split(',')]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return rows, total
+
+    def _upsert(self, table, rows, conflict_columns):
+        stored = []
+        with self.lock:
+            existing = self.tables.setdefault(table, {})
+            for row in rows:
+                if conflict_columns:
+                    key = tuple(row.get(column) for column in conflict_columns)
+                else:
+                    key = ('id', row.get('id', len(existing) + 1))
+                previous = existing.get(key, {})
+                merged = dict(previous)
+                merged.update(row)
+                merged.setdefault('id', previous.get('id', len(existing) + 1))
+                existing[key] = merged
+                stored.append(merged)
+        return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local PostgREST stand-in')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock = MockPostgREST(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(f"Mock PostgREST listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
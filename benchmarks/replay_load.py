@@ -0,0 +1,308 @@
+"""Replay sensor traffic into the upload pipeline at a controlled rate and measure it.
+
+Rows of a dataset, or of the synthetic pond generator, are released on a
+replay clock (--speed times real time, or a fixed --rate of rows per second)
+into a bounded queue. A consumer cuts them into batches for the concurrent
+uploader. The report gives the achieved throughput, the queue depth and the
+end-to-end lag from a row's scheduled release to its upload being
+acknowledged.
+
+Usage:
+    python benchmarks/replay_load.py --speed 10000 --max-seconds 30
+    python benchmarks/replay_load.py --csv Datos_Ficticios_Granjas_Expandido.csv --speed 100
+    python benchmarks/replay_load.py --synthetic-ponds 2000 --cadence 5min --rate 20000 --json replay.json
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_uploader import DEFAULT_MAX_IN_FLIGHT, ConcurrentUploader
+from column_mapping import TABLE_COLUMNS, project_tables
+from pond_data_generator import generate_frames, metric_bounds, pond_name
+from retry_policy import RetryPolicy
+from sinks import RestSink
+from timestamp_parsing import normalize_timestamps
+
+from mock_postgrest import MockPostgREST
+
+_DONE = object()
+
+# How often queue depth is sampled
+SAMPLE_INTERVAL = 0.05
+
+
+def csv_events(csv_path):
+    """The rows of a CSV in timestamp order (the files are sorted as text, not by time)"""
+    df, _ = normalize_timestamps(pd.read_csv(csv_path))
+    yield df.sort_values('timestamp', kind='stable')
+
+
+def synthetic_events(ponds, start, end, cadence, seed=42, bounds_csv='Datos_Ficticios_Granjas.csv'):
+    """Generated readings of `ponds` ponds, block by block in timestamp order"""
+    timestamps = pd.date_range(start, end, freq=cadence, inclusive='left')
+    bounds = metric_bounds(pd.read_csv(bounds_csv))
+    for frame in generate_frames(timestamps, range(ponds), bounds, seed=seed):
+        yield normalize_timestamps(frame)[0]
+
+
+def register_farms(client, farms):
+    """Upsert {farm_name: (latitude, longitude)} into farms and return {farm_name: id}"""
+    rows = [{'farm_name': name, 'latitude': lat, 'longitude': lon} for name, (lat, lon) in farms.items()]
+    for i in range(0, len(rows), 1000):
+        client.table('farms').upsert(rows[i:i + 1000], on_conflict='farm_name', returning='minimal').execute()
+    # Paged: PostgREST caps a response at 1000 rows, and --synthetic-ponds can be larger
+    return {row['farm_name']: row['id'] for row in RestSink(client).fetch_farms() if row['farm_name'] in farms}
+
+
+def percentiles(values, points=(50, 90, 95, 99)):
+    """{'p50': ..., 'max': ...} of an array, or {} when it is empty"""
+    if not len(values):
+        return {}
+    summary = {f"p{point}": float(value) for point, value in zip(points, np.percentile(values, points))}
+    summary['max'] = float(np.max(values))
+    summary['mean'] = float(np.mean(values))
+    return summary
+
+
+class ReplayClock:
+    """Scheduled release time of every row, in seconds since the replay started"""
+
+    def __init__(self, speed=None, rate=None):
+        if (speed is None) == (rate is None):
+            raise ValueError("give exactly one of speed and rate")
+        self.speed = speed
+        self.rate = rate
+        self.origin = None
+        self.rows = 0
+
+    def offsets(self, timestamps):
+        if self.rate is not None:
+            offsets = (self.rows + np.arange(len(timestamps))) / self.rate
+        else:
+            event_times = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+            if self.origin is None:
+                self.origin = event_times[0]
+            offsets = (event_times - self.origin) / self.speed
+        self.rows += len(timestamps)
+        return offsets
+
+
+class ReplayState:
+    """Counters shared by the emitter, the consumer, the upload threads and the sampler"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued_rows = 0
+        self.pending_rows = 0
+        self.emitted_rows = 0
+        self.acked_records = 0
+        self.failed_records = 0
+        self.lags = []
+        self.depth_samples = []
+
+
+def emit(frames, clock, out_queue, state, stop, started):
+    """Release rows into out_queue as they come due on the replay clock"""
+    try:
+        for frame in frames:
+            offsets = clock.offsets(frame['timestamp'])
+            position = 0
+            while position < len(frame) and not stop.is_set():
+                now = time.perf_counter() - started
+                due = int(np.searchsorted(offsets, now, side='right'))
+                if due <= position:
+                    time.sleep(min(offsets[position] - now, SAMPLE_INTERVAL))
+                    continue
+                with state.lock:
+                    state.queued_rows += due - position
+                    state.emitted_rows += due - position
+                out_queue.put((started + offsets[position:due], frame.iloc[position:due]))
+                position = due
+            if stop.is_set():
+                break
+    finally:
+        out_queue.put(_DONE)
+
+
+def sample(state, stop):
+    """Record the queue depth (rows released but not yet sent) until stopped"""
+    while not stop.wait(SAMPLE_INTERVAL):
+        with state.lock:
+            state.depth_samples.append(state.queued_rows + state.pending_rows)
+
+
+def run_replay(client, frames, farm_id_map, speed=None, rate=None, batch_size=500, max_batch_delay=0.5,
+               max_in_flight=DEFAULT_MAX_IN_FLIGHT, queue_size=64, max_seconds=None):
+    """Replay frames into the uploader and return the measured report"""
+    clock = ReplayClock(speed, rate)
+    state = ReplayState()
+    out_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    release_times = {}
+
+    def on_batch_done(table_name, batch, error):
+        acked = time.perf_counter()
+        scheduled = release_times.pop(id(batch))
+        with state.lock:
+            if error is None:
+                state.acked_records += len(batch)
+                state.lags.append(acked - scheduled)
+            else:
+                state.failed_records += len(batch)
+
+    started = time.perf_counter()
+    emitter = threading.Thread(target=emit, args=(frames, clock, out_queue, state, stop, started),
+                               name='replay-emitter', daemon=True)
+    sampler = threading.Thread(target=sample, args=(state, stop),
+                               name='replay-sampler', daemon=True)
+    pending = {table_name: ([], []) for table_name in TABLE_COLUMNS}
+
+    def submit(uploader, table_name, count):
+        records, times = pending[table_name]
+        batch = records[:count]
+        del records[:count]
+        release = np.concatenate(times)
+        batch_times, rest = release[:count], release[count:]
+        times[:] = [rest] if len(rest) else []
+        release_times[id(batch)] = batch_times
+        uploader.submit(table_name, batch)
+
+    with ConcurrentUploader(client, max_in_flight=max_in_flight, stop_table_on_error=False,
+                            retry_policy=RetryPolicy(), verbose=False, on_batch_done=on_batch_done) as uploader:
+        emitter.start()
+        sampler.start()
+        finished = False
+        while not finished:
+            if max_seconds is not None and time.perf_counter() - started > max_seconds:
+                stop.set()
+            try:
+                item = out_queue.get(timeout=max_batch_delay / 2)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                finished = True
+            elif item is not None:
+                release, rows = item
+                payloads = project_tables(rows, farm_id_map)
+                with state.lock:
+                    state.queued_rows -= len(rows)
+                    state.pending_rows += len(rows)
+                for table_name, records in payloads.items():
+                    pending[table_name][0].extend(records)
+                    pending[table_name][1].append(release)
+
+            # Full batches go out at once; a partial batch once its oldest row waited max_batch_delay
+            now = time.perf_counter()
+            for table_name, (records, times) in pending.items():
+                while len(records) >= batch_size:
+                    submit(uploader, table_name, batch_size)
+                if records and (finished or now - times[0][0] >= max_batch_delay):
+                    submit(uploader, table_name, len(records))
+            with state.lock:
+                # Every row feeds all tables; count it as waiting until its last record is sent
+                state.pending_rows = max(len(records) for records, _ in pending.values())
+        uploader.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+
+    emitter.join()
+    sampler.join()
+
+    lags = np.concatenate(state.lags) if state.lags else np.array([])
+    return {
+        'target': {'speed': speed, 'rate': rate},
+        'elapsed_seconds': elapsed,
+        'rows_emitted': state.emitted_rows,
+        'records_uploaded': state.acked_records,
+        'records_failed': state.failed_records,
+        'rows_per_second': state.acked_records / len(TABLE_COLUMNS) / elapsed if elapsed else 0.0,
+        'records_per_second': state.acked_records / elapsed if elapsed else 0.0,
+        'queue_depth_rows': percentiles(np.array(state.depth_samples)),
+        'lag_seconds': percentiles(lags),
+        'stopped_early': max_seconds is not None and elapsed > max_seconds
+    }
+
+
+def print_report(report):
+    target = report['target']
+    goal = f"{target['speed']:g}x real time" if target['speed'] is not None else f"{target['rate']:g} rows/s"
+    print(f"Target            : {goal}")
+    print(f"Elapsed           : {report['elapsed_seconds']:.2f}s{' (stopped at --max-seconds)' if report['stopped_early'] else ''}")
+    print(f"Rows emitted      : {report['rows_emitted']}")
+    print(f"Records uploaded  : {report['records_uploaded']} ({report['records_failed']} failed)")
+    print(f"Throughput        : {report['rows_per_second']:,.0f} rows/s ({report['records_per_second']:,.0f} records/s)")
+    for label, key, unit in (('Queue depth', 'queue_depth_rows', ' rows'), ('End-to-end lag', 'lag_seconds', 's')):
+        summary = report[key]
+        if summary:
+            values = '  '.join(f"{name} {value:.3f}{unit}" if unit == 's' else f"{name} {value:.0f}"
+                               for name, value in summary.items())
+            print(f"{label:<18}: {values}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--csv', default='FishAppData.csv', help='dataset to replay')
+    source.add_argument('--synthetic-ponds', type=int, help='replay generated readings of this many ponds instead')
+    parser.add_argument('--start', default='2025-08-01', help='first synthetic timestamp')
+    parser.add_argument('--end', default='2025-08-02', help='end of the synthetic range (exclusive)')
+    parser.add_argument('--cadence', default='5min', help='time between synthetic readings')
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument('--speed', type=float, help='replay this many times faster than real time (default 10000)')
+    pace.add_argument('--rate', type=float, help='release a fixed number of rows per second instead')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--max-batch-delay', type=float, default=0.5,
+                        help='seconds a partial batch may wait for more rows')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument('--max-seconds', type=float, help='stop releasing rows after this long')
+    parser.add_argument('--latency', type=float, default=0.02, help='mock server latency per request')
+    parser.add_argument('--url', help='replay into this Supabase project instead of a local mock')
+    parser.add_argument('--key', help='API key for --url')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    if args.speed is None and args.rate is None:
+        args.speed = 10000.0
+
+    if args.synthetic_ponds:
+        farms = {pond_name(i): (0.0, 0.0) for i in range(args.synthetic_ponds)}
+        frames = synthetic_events(args.synthetic_ponds, args.start, args.end, args.cadence)
+    else:
+        frame = next(csv_events(args.csv))
+        coordinates = frame.groupby('pond_id')[['latitude', 'longitude']].first() \
+            if {'latitude', 'longitude'} <= set(frame.columns) else None
+        farms = {name: tuple(coordinates.loc[name]) if coordinates is not None else (0.0, 0.0)
+                 for name in frame['pond_id'].unique()}
+        frames = iter([frame])
+
+    from supabase import create_client
+    mock = None
+    if args.url:
+        client = create_client(args.url, args.key)
+    else:
+        mock = MockPostgREST(latency=args.latency).start()
+        client = create_client(mock.url, 'a.b.c')
+    try:
+        farm_id_map = register_farms(client, farms)
+        report = run_replay(client, frames, farm_id_map, speed=args.speed, rate=args.rate,
+                            batch_size=args.batch_size, max_batch_delay=args.max_batch_delay,
+                            max_in_flight=args.max_in_flight, max_seconds=args.max_seconds)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from schema_sql import table_creation_sql
+from timestamp_parsing import format_timestamps
+
+# Declarative mapping from FishAppData.csv columns to Supabase table columns.
+# Every upload script builds its payloads from these dictionaries instead of
+# spelling the row dicts out by hand.
+SENSOR_COLUMNS = {
+    'OD_mg_L': 'dissolved_oxygen',
+    'Temp_C': 'temperature',
+    'pH': 'ph',
+    'Conductivity_uScm': 'conductivity',
+    'PAR_umol_m2s': 'par',
+    'Ammonia_mg_L': 'ammonia',
+    'Nitrite_mg_L': 'nitrite',
+    'Turbidity_NTU': 'turbidity',
+    'Chlorophyll_ug_L': 'chlorophyll'
+}
+
+WEATHER_COLUMNS = {
+    'AirPressure_hPa': 'air_pressure',
+    'Wind_m_s': 'wind_speed',
+    'Rain_mm': 'rainfall'
+}
+
+OPERATIONAL_COLUMNS = {
+    'Flow_m3_h': 'flow_rate',
+    'Lirio_Coverage_pct': 'lirio_coverage',
+    'Aerator_Status': 'aerator_status'
+}
+
+# Relational tables keyed on (farm_id, timestamp), see create_tables.sql
+TABLE_COLUMNS = {
+    'sensor_readings': SENSOR_COLUMNS,
+    'weather_data': WEATHER_COLUMNS,
+    'operational_data': OPERATIONAL_COLUMNS
+}
+
+# Target columns sent as integers; everything else is sent as a float
+INTEGER_COLUMNS = {'aerator_status'}
+
+def decimal_columns(sql=None):
+    """{column: (precision, scale)} of every DECIMAL column declared in sql (default: the table schema)"""
+    if sql is None:
+        sql = '\n'.join(table_creation_sql.values())
+    return {name: (int(precision), int(scale))
+            for name, precision, scale in re.findall(r'(\w+)\s+DECIMAL\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', sql, re.I)}
+
+
+DECIMAL_COLUMNS = decimal_columns()
+
+
+def _column_array(series, target, round_to_scale=False):
+    """Convert a source column to a numpy array of the type it is sent as.
+
+    With round_to_scale, DECIMAL columns are rounded to their scale: the
+    database keeps no more digits, and short numbers serialize faster and
+    smaller than 17-digit ones.
+    """
+    if target in INTEGER_COLUMNS:
+        # Values blanked by validation stay NaN; their rows are not sent to that table
+        return series.to_numpy(dtype='float64' if series.hasnans else 'int64')
+    values = series.to_numpy(dtype='float64')
+    # Compact frames keep float32 columns rounded to their scale; this also drops the widening noise
+    if target in DECIMAL_COLUMNS and (round_to_scale or series.dtype == np.float32):
+        values = values.round(DECIMAL_COLUMNS[target][1])
+    return values
+
+
+def _key_values(series):
+    """Key column as a list; parsed timestamps are serialized to ISO-8601 UTC here"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return format_timestamps(series)
+    return series.tolist()
+
+
+def build_records(columns):
+    """Zip {column: values} into a list of row dicts"""
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def project_arrays(df, farm_id_map, tables=TABLE_COLUMNS):
+    """Rows of df whose farm is known, as numpy arrays: farm_id, timestamp and every mapped target column.
+
+    The pond_id -> farm_id lookup is a single Series.map over the frame; rows
+    whose farm is unknown are dropped, like the old per-row loops did.
+    Readings are rounded to the scale of their DECIMAL column.
+    """
+    farm_ids = df['pond_id'].map(farm_id_map)
+    known = farm_ids.notna().to_numpy()
+    if not known.all():
+        df = df.loc[known]
+        farm_ids = farm_ids[known]
+
+    arrays = {'farm_id': farm_ids.to_numpy(dtype='int64'), 'timestamp': df['timestamp'].to_numpy()}
+    for mapping in tables.values():
+        for source, target in mapping.items():
+            arrays[target] = _column_array(df[source], target, round_to_scale=True)
+    return arrays
+
+
+def project_tables(df, farm_id_map, tables=TABLE_COLUMNS, arrays=None):
+    """Build the payload of every relational table in one vectorized pass.
+
+    Each source column is converted exactly once (by project_arrays, or
+    passed in as arrays) and shared by all tables.
+    """
+    if arrays is None:
+        arrays = project_arrays(df, farm_id_map, tables)
+
+    keys = {
+        'farm_id': arrays['farm_id'].tolist(),
+        'timestamp': _key_values(pd.Series(arrays['timestamp']))
+    }
+
+    payloads = {}
+    for table_name, mapping in tables.items():
+        columns = dict(keys)
+        columns.update({target: arrays[target].tolist() for target in mapping.values()})
+        payloads[table_name] = build_records(columns)
+
+    return payloads
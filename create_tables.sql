@@ -53,19 +53,57 @@ CREATE TABLE IF NOT EXISTS operational_data (
     UNIQUE(farm_id, timestamp)
 );
 
--- 5. Create indexes for better performance
+-- 5. Create hourly and daily rollup tables (min/max/mean/sum/count/last per farm, metric and bucket),
+--    filled by the upload scripts for long-range charts
+CREATE TABLE IF NOT EXISTS metric_rollups_hourly (
+    id SERIAL PRIMARY KEY,
+    farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    mean_value DOUBLE PRECISION,
+    sum_value DOUBLE PRECISION,
+    sample_count INTEGER NOT NULL,
+    last_value DOUBLE PRECISION,
+    last_timestamp TIMESTAMP WITH TIME ZONE,
+    UNIQUE(farm_id, metric, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS metric_rollups_daily (
+    id SERIAL PRIMARY KEY,
+    farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    mean_value DOUBLE PRECISION,
+    sum_value DOUBLE PRECISION,
+    sample_count INTEGER NOT NULL,
+    last_value DOUBLE PRECISION,
+    last_timestamp TIMESTAMP WITH TIME ZONE,
+    UNIQUE(farm_id, metric, bucket)
+);
+
+-- Rollup tables created before sum_value existed
+ALTER TABLE metric_rollups_hourly ADD COLUMN IF NOT EXISTS sum_value DOUBLE PRECISION;
+ALTER TABLE metric_rollups_daily ADD COLUMN IF NOT EXISTS sum_value DOUBLE PRECISION;
+
+-- 6. Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_sensor_readings_farm_timestamp ON sensor_readings(farm_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_weather_data_farm_timestamp ON weather_data(farm_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_operational_data_farm_timestamp ON operational_data(farm_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_farms_name ON farms(farm_name);
 
--- 6. Enable Row Level Security (RLS) - Optional but recommended
+-- 7. Enable Row Level Security (RLS) - Optional but recommended
 ALTER TABLE farms ENABLE ROW LEVEL SECURITY;
 ALTER TABLE sensor_readings ENABLE ROW LEVEL SECURITY;
 ALTER TABLE weather_data ENABLE ROW LEVEL SECURITY;
 ALTER TABLE operational_data ENABLE ROW LEVEL SECURITY;
+ALTER TABLE metric_rollups_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE metric_rollups_daily ENABLE ROW LEVEL SECURITY;
 
--- 7. Create policies for public access (adjust as needed for your security requirements)
+-- 8. Create policies for public access (adjust as needed for your security requirements)
 CREATE POLICY "Enable read access for all users" ON farms FOR SELECT USING (true);
 CREATE POLICY "Enable insert access for all users" ON farms FOR INSERT WITH CHECK (true);
 CREATE POLICY "Enable update access for all users" ON farms FOR UPDATE USING (true);
@@ -82,6 +120,14 @@ CREATE POLICY "Enable read access for all users" ON operational_data FOR SELECT
 CREATE POLICY "Enable insert access for all users" ON operational_data FOR INSERT WITH CHECK (true);
 CREATE POLICY "Enable update access for all users" ON operational_data FOR UPDATE USING (true);
 
+CREATE POLICY "Enable read access for all users" ON metric_rollups_hourly FOR SELECT USING (true);
+CREATE POLICY "Enable insert access for all users" ON metric_rollups_hourly FOR INSERT WITH CHECK (true);
+CREATE POLICY "Enable update access for all users" ON metric_rollups_hourly FOR UPDATE USING (true);
+
+CREATE POLICY "Enable read access for all users" ON metric_rollups_daily FOR SELECT USING (true);
+CREATE POLICY "Enable insert access for all users" ON metric_rollups_daily FOR INSERT WITH CHECK (true);
+CREATE POLICY "Enable update access for all users" ON metric_rollups_daily FOR UPDATE USING (true);
+
 -- Verification queries (run these after table creation to verify)
 -- SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name IN ('farms', 'sensor_readings', 'weather_data', 'operational_data');
 -- SELECT * FROM farms LIMIT 5;
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from batch_uploader import CONFLICT_COLUMNS, DEFAULT_MAX_IN_FLIGHT, ConcurrentUploader
+
+# Batches that failed for good, one JSON object per line
+DEAD_LETTERS_FILE = os.path.join('.fishapp', 'dead_letters.jsonl')
+
+# Rows the server rejected on their own when a failed batch was bisected, one per line
+REJECTS_FILE = os.path.join('.fishapp', 'rejects.jsonl')
+
+
+class DeadLetterFile:
+    """Append-only JSON-lines file of batches that could not be uploaded"""
+
+    def __init__(self, path=DEAD_LETTERS_FILE):
+        self.path = path
+        self.batches = 0
+        self.records = 0
+        self._lock = threading.Lock()
+
+    def add(self, table_name, rows, error, attempts=1, on_conflict=None):
+        """Record one failed batch with the error that made it fail"""
+        entry = {
+            'table': table_name,
+            'on_conflict': on_conflict,
+            'error': str(error),
+            'error_code': getattr(error, 'code', None),
+            'attempts': attempts,
+            'failed_at': datetime.now(timezone.utc).isoformat(),
+            'rows': rows
+        }
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+            self.batches += 1
+            self.records += len(rows)
+
+
+class RejectedRowsFile:
+    """Append-only JSON-lines file of single rows the server rejected, each with its error"""
+
+    def __init__(self, path=REJECTS_FILE):
+        self.path = path
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, table_name, rejected, on_conflict=None):
+        """Record [(row, error)] of one table"""
+        rejected_at = datetime.now(timezone.utc).isoformat()
+        lines = [json.dumps({
+            'table': table_name,
+            'on_conflict': on_conflict,
+            'error': str(error),
+            'error_code': getattr(error, 'code', None),
+            'rejected_at': rejected_at,
+            'row': row
+        }, default=str) for row, error in rejected]
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.rows += len(rejected)
+
+
+def read_dead_letters(path=DEAD_LETTERS_FILE):
+    """Every recorded batch, oldest first ([] when there is no file)"""
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def replay_dead_letters(client, path=DEAD_LETTERS_FILE, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                        retry_policy=None, rejects=None, verbose=True, metrics=None):
+    """Upload recorded batches again; only batches that still fail stay in the file.
+
+    Batches that fail again are written to a side file, which replaces the
+    original once the replay is done (the file is removed when all succeed).
+    With rejects (a RejectedRowsFile), batches rejected for their content
+    are bisected and only their bad rows are set aside there. Returns
+    (batches replayed, batches still failing). metrics (a RunMetrics)
+    counts the replayed requests like those of an upload.
+    """
+    entries = read_dead_letters(path)
+    if not entries:
+        return 0, 0
+    pending_path = path + '.replay'
+    if os.path.exists(pending_path):
+        os.remove(pending_path)
+    remaining = DeadLetterFile(pending_path)
+
+    by_conflict = {}
+    for entry in entries:
+        by_conflict.setdefault(entry.get('on_conflict') or CONFLICT_COLUMNS, []).append(entry)
+    for on_conflict, group in by_conflict.items():
+        with ConcurrentUploader(client, max_in_flight=max_in_flight, stop_table_on_error=False,
+                                on_conflict=on_conflict, retry_policy=retry_policy,
+                                dead_letters=remaining, rejects=rejects, verbose=verbose,
+                                metrics=metrics) as uploader:
+            for entry in group:
+                uploader.submit(entry['table'], entry['rows'])
+
+    if remaining.batches:
+        os.replace(pending_path, path)
+    else:
+        os.remove(path)
+    return len(entries), remaining.batches
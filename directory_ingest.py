@@ -0,0 +1,131 @@
+import glob
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from farm_locations import add_coordinates
+from frame_cache import file_digest
+from run_metrics import RunMetrics
+from sensor_frames import load_sensor_frame
+from timestamp_parsing import DEFAULT_SOURCE_TIMEZONE
+
+# Files already ingested by --dir runs: path -> size, mtime, content digest
+INGESTED_FILES_FILE = os.path.join('.fishapp', 'ingested_files.json')
+
+DEFAULT_PATTERN = '*.csv'
+
+# Parsed files kept ahead of the upload, per worker process
+FILES_AHEAD_PER_WORKER = 2
+
+
+def discover_files(directory, pattern=DEFAULT_PATTERN):
+    """Files in directory matching pattern ('**' recurses), in name order"""
+    paths = glob.glob(os.path.join(directory, pattern), recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+class IngestedFiles:
+    """Ledger of the files a directory ingest has uploaded, by path and content.
+
+    A file is skipped when its path was ingested and its size and mtime are
+    unchanged; with the same size but a new mtime the content digest decides,
+    as for the frame cache. A new path whose content matches an ingested
+    file (a copy, or a file moved into the directory) is skipped too.
+    record() only updates memory; save() writes the ledger.
+    """
+
+    def __init__(self, path=INGESTED_FILES_FILE):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.files = json.load(f)
+        except (OSError, ValueError):
+            self.files = {}
+        self._digests = {entry['digest'] for entry in self.files.values()}
+        # Digests computed by pending() and not recorded yet
+        self._computed = {}
+
+    def _is_ingested(self, key, path, stat):
+        entry = self.files.get(key)
+        if entry is not None and entry['size'] == stat.st_size:
+            if entry['mtime_ns'] == stat.st_mtime_ns:
+                return True
+            digest = self._computed[key] = file_digest(path)
+            if digest == entry['digest']:
+                entry['mtime_ns'] = stat.st_mtime_ns
+                return True
+            return False
+        digest = self._computed[key] = file_digest(path)
+        if digest in self._digests:
+            self.files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest,
+                               'rows': None, 'ingested_at': datetime.now(timezone.utc).isoformat()}
+            return True
+        return False
+
+    def pending(self, paths):
+        """The paths that were not ingested yet, or whose content changed since"""
+        return [path for path in paths if not self._is_ingested(os.path.abspath(path), path, os.stat(path))]
+
+    def record(self, path, rows):
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = self._computed.pop(key, None) or file_digest(path)
+        self.files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest,
+                           'rows': rows, 'ingested_at': datetime.now(timezone.utc).isoformat()}
+        self._digests.add(digest)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.files, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def parse_file(path, source_tz=DEFAULT_SOURCE_TIMEZONE, coordinates=None):
+    """Worker: one readings CSV in compact form, ready to project.
+
+    Returns (path, frame, timestamp failures, {stage: seconds}). Compact frames are cheap to send back to the parent
+    process; the row dicts they project to are not, so projection stays
+    there. The frame cache is not used for files that are read once.
+    """
+    metrics = RunMetrics()
+    df, failures = load_sensor_frame(path, use_cache=False, source_tz=source_tz, metrics=metrics)
+    if coordinates is not None:
+        with metrics.timer('parse'):
+            df = add_coordinates(df, coordinates)
+    return path, df, failures, dict(metrics.stage_seconds)
+
+
+def parse_files(paths, workers=1, source_tz=DEFAULT_SOURCE_TIMEZONE, coordinates=None):
+    """Yield parse_file() of every path, in order, parsed by up to workers processes.
+
+    At most FILES_AHEAD_PER_WORKER files per worker are parsed ahead of the
+    consumer, so memory stays bounded however many files there are. A file
+    that fails to parse yields (path, None, exception, {}) instead.
+    """
+    options = {'source_tz': source_tz, 'coordinates': coordinates}
+    if workers <= 1:
+        for path in paths:
+            try:
+                yield parse_file(path, **options)
+            except Exception as e:
+                yield path, None, e, {}
+        return
+
+    def result(path, future):
+        try:
+            return future.result()
+        except Exception as e:
+            return path, None, e, {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(parse_file, path, **options)))
+            if len(pending) >= FILES_AHEAD_PER_WORKER * workers:
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from frame_cache import read_excel_cached
+from pond_data_generator import pond_name
+
+COORDINATES_XLSX = 'Coordenadas_Granjas.xlsx'
+
+# Metres per degree of latitude (and of longitude at the equator)
+METRES_PER_DEGREE = 6371008.8 * np.pi / 180
+
+# Average number of farms per grid cell
+FARMS_PER_CELL = 2
+
+
+def parse_coordinate_sheet(sheet):
+    """Farm name, pond id, latitude and longitude from the 'Nombre granja' / 'Coordenadas' sheet.
+
+    'Granja N' is the pond at position N (Granja 1 -> Pond_A, Granja 27 ->
+    Pond_AA); coordinates are 'lat, lon' text. Rows that match neither are
+    dropped.
+    """
+    names = sheet['Nombre granja'].astype(str).str.strip()
+    numbers = pd.to_numeric(names.str.extract(r'Granja\s+(\d+)', expand=False), errors='coerce')
+    coordinates = sheet['Coordenadas'].astype(str).str.extract(
+        r'^\s*([-+]?\d+(?:\.\d+)?)\s*,\s*([-+]?\d+(?:\.\d+)?)\s*$')
+    farms = pd.DataFrame({
+        'farm_name': names,
+        'number': numbers,
+        'latitude': pd.to_numeric(coordinates[0], errors='coerce'),
+        'longitude': pd.to_numeric(coordinates[1], errors='coerce')
+    }).dropna().drop_duplicates('number', keep='last')
+    farms.insert(1, 'pond_id', [pond_name(int(number) - 1) for number in farms['number']])
+    return farms.sort_values('number').drop(columns='number').reset_index(drop=True)
+
+
+def load_farm_coordinates(path=COORDINATES_XLSX):
+    """Parsed coordinate sheet (the workbook itself is read through the frame cache)"""
+    return parse_coordinate_sheet(read_excel_cached(path))
+
+
+def add_coordinates(data, farms, missing=0.0):
+    """Set latitude/longitude of every reading from its pond_id in one lookup per column"""
+    by_pond = farms.set_index('pond_id')
+    for column in ('latitude', 'longitude'):
+        data[column] = data['pond_id'].map(by_pond[column]).fillna(missing).astype('float64')
+    return data
+
+
+def _ranges(starts, counts):
+    """Concatenation of range(start, start + count) for every pair, without a Python loop"""
+    runs = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(runs, counts) + np.repeat(starts, counts)
+
+
+class FarmIndex:
+    """Uniform grid over farm locations for vectorized nearest-farm and bounding-box queries.
+
+    Coordinates are projected equirectangularly around the farms' mean
+    latitude, which is accurate to well under 1% over a few hundred km.
+    Farms are sorted by grid cell, so every cell (and every row of cells)
+    is one contiguous slice of the arrays.
+    """
+
+    def __init__(self, names, latitudes, longitudes):
+        self.names = np.asarray(names, dtype=object)
+        self.latitudes = np.asarray(latitudes, dtype='float64')
+        self.longitudes = np.asarray(longitudes, dtype='float64')
+        count = len(self.latitudes)
+        self._scale = np.cos(np.radians(self.latitudes.mean())) if count else 1.0
+
+        x, y = self._project(self.latitudes, self.longitudes)
+        self._x0 = x.min() if count else 0.0
+        self._y0 = y.min() if count else 0.0
+        width = x.max() - self._x0 if count else 0.0
+        height = y.max() - self._y0 if count else 0.0
+        # About FARMS_PER_CELL farms per cell, never more cells along one side than farms
+        self.cell_size = max(np.sqrt(FARMS_PER_CELL * width * height / max(count, 1)),
+                             max(width, height) / max(count, 1), 1e-9)
+        self._nx = int(width // self.cell_size) + 1
+        self._ny = int(height // self.cell_size) + 1
+
+        cells = self._cell_ids(*self._cells(x, y))
+        self._order = np.argsort(cells, kind='stable')
+        self._x = x[self._order]
+        self._y = y[self._order]
+        self._cell_start = np.searchsorted(cells[self._order], np.arange(self._nx * self._ny + 1))
+
+    @classmethod
+    def from_frame(cls, farms, name_column='farm_name'):
+        return cls(farms[name_column].to_numpy(), farms['latitude'].to_numpy(), farms['longitude'].to_numpy())
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _project(self, latitudes, longitudes):
+        return np.asarray(longitudes, dtype='float64') * self._scale, np.asarray(latitudes, dtype='float64')
+
+    def _cells(self, x, y):
+        cx = np.clip(np.floor((x - self._x0) / self.cell_size), 0, self._nx - 1).astype('int64')
+        cy = np.clip(np.floor((y - self._y0) / self.cell_size), 0, self._ny - 1).astype('int64')
+        return cx, cy
+
+    def _cell_ids(self, cx, cy):
+        return cy * self._nx + cx
+
+    def _gather(self, queries, cx, cy):
+        """(query, farm) candidate pairs for queries[i] and the cell (cx[i], cy[i])"""
+        inside = (cx >= 0) & (cx < self._nx) & (cy >= 0) & (cy < self._ny)
+        queries, cells = queries[inside], self._cell_ids(cx[inside], cy[inside])
+        starts = self._cell_start[cells]
+        counts = self._cell_start[cells + 1] - starts
+        return np.repeat(queries, counts), _ranges(starts, counts)
+
+    def nearest(self, latitudes, longitudes, max_distance=None):
+        """Nearest farm of every point: (farm positions, distances in metres).
+
+        Positions index self.names; -1 (and distance inf) where there is no
+        farm, or none within max_distance metres.
+        """
+        qx, qy = self._project(latitudes, longitudes)
+        qx, qy = np.atleast_1d(qx), np.atleast_1d(qy)
+        best = np.full(len(qx), -1, dtype='int64')
+        best_d2 = np.full(len(qx), np.inf)
+        if not len(self):
+            return best, best_d2
+        limit = np.inf if max_distance is None else max_distance / METRES_PER_DEGREE
+        cx, cy = self._cells(qx, qy)
+        pending = np.arange(len(qx))
+        ring = 0
+        while pending.size:
+            # Cells at Chebyshev distance `ring` from each pending query's cell
+            span = np.arange(-ring, ring + 1)
+            dx, dy = np.meshgrid(span, span)
+            edge = np.maximum(np.abs(dx), np.abs(dy)) == ring
+            dx, dy = dx[edge], dy[edge]
+            queries, farms = self._gather(np.repeat(pending, len(dx)),
+                                          (cx[pending, None] + dx).ravel(), (cy[pending, None] + dy).ravel())
+            if queries.size:
+                d2 = (self._x[farms] - qx[queries]) ** 2 + (self._y[farms] - qy[queries]) ** 2
+                # Pairs come grouped by query; keep the closest farm(s) of each group
+                starts = np.flatnonzero(np.r_[True, queries[1:] != queries[:-1]])
+                sizes = np.diff(np.r_[starts, len(queries)])
+                shortest = d2 == np.repeat(np.minimum.reduceat(d2, starts), sizes)
+                queries, farms, d2 = queries[shortest], farms[shortest], d2[shortest]
+                closer = d2 < best_d2[queries]
+                best[queries[closer]] = farms[closer]
+                best_d2[queries[closer]] = d2[closer]
+
+            # Farms outside the searched block are at least `bound` away, except across
+            # sides of the block that already lie on the edge of the grid
+            x0, y0 = self._x0 + (cx[pending] - ring) * self.cell_size, self._y0 + (cy[pending] - ring) * self.cell_size
+            x1, y1 = x0 + (2 * ring + 1) * self.cell_size, y0 + (2 * ring + 1) * self.cell_size
+            px, py = qx[pending], qy[pending]
+            bound = np.full(len(pending), np.inf)
+            for open_side, gap in ((cx[pending] - ring > 0, px - x0), (cx[pending] + ring < self._nx - 1, x1 - px),
+                                   (cy[pending] - ring > 0, py - y0), (cy[pending] + ring < self._ny - 1, y1 - py)):
+                bound = np.where(open_side, np.minimum(bound, gap), bound)
+            done = (np.sqrt(best_d2[pending]) <= bound) | (bound >= limit)
+            pending = pending[~done]
+            ring += 1
+
+        distances = np.sqrt(best_d2) * METRES_PER_DEGREE
+        found = best >= 0
+        best[found] = self._order[best[found]]
+        if max_distance is not None:
+            too_far = distances > max_distance
+            best[too_far] = -1
+            distances[too_far] = np.inf
+        return best, distances
+
+    def nearest_names(self, latitudes, longitudes, max_distance=None):
+        """Name of the nearest farm of every point (None where there is none) and its distance in metres"""
+        positions, distances = self.nearest(latitudes, longitudes, max_distance)
+        names = np.full(len(positions), None, dtype=object)
+        names[positions >= 0] = self.names[positions[positions >= 0]]
+        return names, distances
+
+    def within_boxes(self, min_latitudes, min_longitudes, max_latitudes, max_longitudes):
+        """Farms inside each of many latitude/longitude boxes, edges included, in one vectorized pass.
+
+        Returns (box numbers, farm positions) pairs, ordered by box and then
+        position.
+        """
+        bounds = [np.atleast_1d(np.asarray(value, dtype='float64'))
+                  for value in (min_latitudes, min_longitudes, max_latitudes, max_longitudes)]
+        min_latitudes, min_longitudes, max_latitudes, max_longitudes = np.broadcast_arrays(*bounds)
+        if not len(self):
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+        x_low, x_high = self._project(min_latitudes, min_longitudes)[0], self._project(max_latitudes, max_longitudes)[0]
+        cx0, cy0 = self._cells(x_low, min_latitudes)
+        cx1, cy1 = self._cells(x_high, max_latitudes)
+        rows = np.where((min_latitudes <= max_latitudes) & (min_longitudes <= max_longitudes), cy1 - cy0 + 1, 0)
+
+        # Every (box, row of cells) is one contiguous slice of the sorted farms
+        box_rows = np.repeat(np.arange(len(rows)), rows)
+        cy = cy0[box_rows] + _ranges(np.zeros(len(rows), dtype='int64'), rows)
+        starts = self._cell_start[self._cell_ids(cx0[box_rows], cy)]
+        counts = self._cell_start[self._cell_ids(cx1[box_rows], cy) + 1] - starts
+        boxes, candidates = np.repeat(box_rows, counts), _ranges(starts, counts)
+
+        x, y = self._x[candidates], self._y[candidates]
+        inside = ((x >= x_low[boxes]) & (x <= x_high[boxes]) &
+                  (y >= min_latitudes[boxes]) & (y <= max_latitudes[boxes]))
+        boxes, positions = boxes[inside], self._order[candidates[inside]]
+        order = np.lexsort((positions, boxes))
+        return boxes[order], positions[order]
+
+    def within(self, min_latitude, min_longitude, max_latitude, max_longitude):
+        """Positions (ascending) of the farms inside one latitude/longitude bounding box, edges included"""
+        return self.within_boxes(min_latitude, min_longitude, max_latitude, max_longitude)[1]
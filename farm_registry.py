@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FARM_REGISTRY_FILE = '.fishapp/farm_registry.json'
+REGISTRY_VERSION = 1
+
+# farms.latitude / farms.longitude are DECIMAL(10, 8) / DECIMAL(11, 8)
+COORDINATE_DECIMALS = 8
+
+_COLUMNS = ['id', 'latitude', 'longitude']
+
+
+def sink_identity(sink):
+    """Short fingerprint of the database a sink writes to (the DSN may hold a password)"""
+    target = getattr(sink, 'target', None) or type(sink).__name__
+    return hashlib.blake2b(str(target).encode(), digest_size=8).hexdigest()
+
+
+def _as_timestamp(value):
+    """UTC pd.Timestamp of a server updated_at (ISO text or datetime), None when missing"""
+    if value is None or value is pd.NaT:
+        return None
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def _latest(*values):
+    timestamps = [timestamp for timestamp in map(_as_timestamp, values) if timestamp is not None]
+    return max(timestamps).isoformat() if timestamps else None
+
+
+def _empty_catalog():
+    return pd.DataFrame({'id': pd.Series(dtype='int64'), 'latitude': pd.Series(dtype='float64'),
+                         'longitude': pd.Series(dtype='float64')},
+                        index=pd.Index([], dtype=object, name='farm_name'))
+
+
+def _catalog(rows):
+    """farm_name-indexed frame of id, latitude and longitude from server rows"""
+    if not rows:
+        return _empty_catalog()
+    catalog = pd.DataFrame(rows).drop_duplicates('farm_name', keep='last').set_index('farm_name')
+    catalog = catalog.reindex(columns=_COLUMNS)
+    return catalog.astype({'id': 'int64', 'latitude': 'float64', 'longitude': 'float64'})
+
+
+class FarmRegistry:
+    """Local copy of the farms catalog (farm_name -> id, coordinates), checked against the server once per run.
+
+    The check is one cheap request: the number of farms and the newest
+    updated_at. When both match what was saved, the saved ids are used as
+    they are; otherwise the catalog is read again in full. Only farms that
+    are new or whose coordinates changed are upserted.
+    """
+
+    def __init__(self, sink, path=FARM_REGISTRY_FILE):
+        self.sink = sink
+        self.path = path
+        self.identity = sink_identity(sink)
+        self.catalog = _empty_catalog()
+        self.updated_at = None
+        self.validated = False
+        # Farms written by the last resolve()
+        self.uploaded = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        # A registry of another database (or format) is useless here
+        if saved.get('version') != REGISTRY_VERSION or saved.get('target') != self.identity:
+            return
+        farms = saved['farms']
+        self.catalog = _catalog([
+            {'farm_name': name, 'id': farm_id, 'latitude': latitude, 'longitude': longitude}
+            for name, farm_id, latitude, longitude in zip(farms['farm_name'], farms['id'],
+                                                          farms['latitude'], farms['longitude'])
+        ])
+        self.updated_at = saved.get('updated_at')
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        farms = {
+            'farm_name': self.catalog.index.tolist(),
+            'id': self.catalog['id'].tolist(),
+            'latitude': self.catalog['latitude'].tolist(),
+            'longitude': self.catalog['longitude'].tolist()
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': REGISTRY_VERSION, 'target': self.identity,
+                       'updated_at': self.updated_at, 'farms': farms}, f)
+        os.replace(tmp, self.path)
+
+    def validate(self):
+        """Compare farm count and newest updated_at with the server; reload the catalog when they differ.
+
+        Returns True when the saved registry was still current.
+        """
+        count, latest = self.sink.probe_farms()
+        current = count == len(self.catalog) and _as_timestamp(latest) == _as_timestamp(self.updated_at)
+        if not current:
+            self.refresh()
+        self.validated = True
+        return current
+
+    def refresh(self):
+        """Read the whole farms catalog from the server"""
+        rows = self.sink.fetch_farms()
+        self.catalog = _catalog(rows)
+        self.updated_at = _latest(*(row.get('updated_at') for row in rows))
+        self.save()
+
+    def changed_farms(self, farms):
+        """Rows of farms (dicts of farm_name, latitude, longitude) that are unknown or moved"""
+        incoming = pd.DataFrame(farms, columns=['farm_name', 'latitude', 'longitude'])
+        incoming = incoming.drop_duplicates('farm_name', keep='last').set_index('farm_name')
+        known = self.catalog.reindex(incoming.index)
+        moved = np.zeros(len(incoming), dtype=bool)
+        for column in ('latitude', 'longitude'):
+            moved |= (known[column].round(COORDINATE_DECIMALS).to_numpy()
+                      != incoming[column].astype('float64').round(COORDINATE_DECIMALS).to_numpy())
+        changed = incoming.loc[known['id'].isna().to_numpy() | moved]
+        return [
+            {'farm_name': name, 'latitude': float(latitude), 'longitude': float(longitude)}
+            for name, latitude, longitude in zip(changed.index, changed['latitude'], changed['longitude'])
+        ]
+
+    def resolve(self, farms):
+        """Make sure every farm exists on the server and return {farm_name: id} of all known farms"""
+        if not self.validated:
+            self.validate()
+        changed = self.changed_farms(farms)
+        self.uploaded = len(changed)
+        if changed:
+            stamp = pd.Timestamp.now(tz='UTC').isoformat()
+            stored = self.sink.upsert_farms([dict(farm, updated_at=stamp) for farm in changed])
+            by_name = {farm['farm_name']: farm for farm in changed}
+            updates = _catalog([dict(by_name[row['farm_name']], id=row['id']) for row in stored])
+            self.catalog = pd.concat([self.catalog.drop(updates.index, errors='ignore'), updates])
+            self.updated_at = _latest(self.updated_at, *(row.get('updated_at') or stamp for row in stored))
+            self.save()
+        return self.farm_id_map()
+
+    def farm_id_map(self):
+        """{farm_name: id} of every farm on the server"""
+        if not self.validated:
+            self.validate()
+        return dict(zip(self.catalog.index, self.catalog['id'].tolist()))
@@ -0,0 +1,157 @@
+"""fishapp: one command line for the fish farm data pipeline.
+
+    python fishapp.py ingest [options]      upload a readings CSV or a directory of them (see: python fishapp.py ingest --help)
+    python fishapp.py replay [options]      re-upload the batches saved in the dead-letter file
+    python fishapp.py generate [options]    expand the sample data or generate a synthetic dataset
+    python fishapp.py inspect [CSV]         summarize a readings CSV and the local pipeline state
+    python fishapp.py schema [TABLE ...]    print the SQL for the Supabase tables
+
+Only argparse is imported up front; each subcommand imports what it needs
+(pandas and the Supabase client for ingest and replay), so --help and
+schema start fast.
+"""
+import argparse
+import sys
+
+
+def ingest(argv, prog):
+    """upload a readings CSV, or the new CSVs of a directory, to the relational schema"""
+    import supabase_relational_upload
+    supabase_relational_upload.main(argv, prog=prog)
+
+
+def replay(argv, prog):
+    """upload the batches saved in .fishapp/dead_letters.jsonl again"""
+    import supabase_relational_upload
+    supabase_relational_upload.main(['--replay-dead-letters'] + argv, prog=prog)
+
+
+def generate(argv, prog):
+    """expand Datos_Ficticios_Granjas.csv with ponds D-O, or generate a synthetic dataset"""
+    import generate_additional_pond_data
+    generate_additional_pond_data.main(argv, prog=prog)
+
+
+def schema(args):
+    if args.sqlite:
+        from sinks import sqlite_schema
+        for statement in sqlite_schema():
+            print(statement + ';')
+        return
+    from schema_sql import print_schema_sql, table_creation_sql
+    unknown = [table for table in args.tables if table not in table_creation_sql]
+    if unknown:
+        raise SystemExit(f"unknown table(s): {', '.join(unknown)}; choose from {', '.join(table_creation_sql)}")
+    print_schema_sql(args.tables)
+
+
+def inspect(args):
+    """Print what a readings CSV holds and the state the pipeline keeps under .fishapp/"""
+    import json
+    import os
+
+    if args.csv:
+        from column_mapping import TABLE_COLUMNS
+        from sensor_frames import load_sensor_frame, memory_report
+        from timestamp_parsing import DEFAULT_SOURCE_TIMEZONE
+
+        df, failures = load_sensor_frame(args.csv, use_cache=not args.no_cache,
+                                         source_tz=args.source_tz or DEFAULT_SOURCE_TIMEZONE)
+        print(f"📄 {args.csv}: {len(df):,} rows, {df['pond_id'].nunique()} farms, {memory_report(df)}")
+        if len(df):
+            print(f"   {df['timestamp'].min()} to {df['timestamp'].max()} (UTC)")
+        if failures:
+            print(f"   ⚠️  {failures} rows with a timestamp that could not be parsed")
+        for table_name, mapping in TABLE_COLUMNS.items():
+            print(f"\n   {table_name}:")
+            for source, target in mapping.items():
+                if source not in df.columns:
+                    print(f"     {target:<18} missing ({source})")
+                    continue
+                values = df[source]
+                print(f"     {target:<18} {str(values.dtype):<8} {int(values.isna().sum()):>6} missing  "
+                      f"min {values.min():<12.6g} max {values.max():.6g}")
+
+    from watermarks import WATERMARKS_FILE, load_watermarks
+    from dead_letters import DEAD_LETTERS_FILE, REJECTS_FILE, read_dead_letters
+    from run_metrics import RUN_SUMMARY_FILE
+    from alerts import ALERTS_FILE
+    from schema_validation import QUARANTINE_FILE, count_quarantined
+
+    print("\n🗂️  Local state:")
+    marks = load_watermarks()
+    if marks:
+        for table_name, farms in marks.items():
+            print(f"   {WATERMARKS_FILE}: {table_name} up to {max(farms.values())} for {len(farms)} farms")
+    else:
+        print(f"   {WATERMARKS_FILE}: none (no incremental run yet)")
+
+    entries = read_dead_letters()
+    rows = sum(len(entry['rows']) for entry in entries)
+    print(f"   {DEAD_LETTERS_FILE}: {len(entries)} batches ({rows} rows) waiting for replay")
+
+    if os.path.exists(REJECTS_FILE):
+        with open(REJECTS_FILE) as f:
+            print(f"   {REJECTS_FILE}: {sum(1 for _ in f)} rows rejected by the server")
+
+    quarantined = count_quarantined()
+    if quarantined:
+        print(f"   {QUARANTINE_FILE}: {sum(quarantined.values())} rows that failed validation "
+              f"({', '.join(f'{rows} {table_name}' for table_name, rows in sorted(quarantined.items()))})")
+
+    if os.path.exists(ALERTS_FILE):
+        with open(ALERTS_FILE) as f:
+            print(f"   {ALERTS_FILE}: {sum(1 for _ in f)} alerts logged")
+
+    try:
+        with open(RUN_SUMMARY_FILE) as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        summary = None
+    if summary:
+        rows = sum(table.get('rows', 0) for table in summary['tables'].values())
+        print(f"   {RUN_SUMMARY_FILE}: last run started {summary['started_at']}, "
+              f"{summary['duration_seconds']:.1f}s, {rows:,} rows uploaded")
+
+
+# Options of these commands are parsed by the module that runs them
+DELEGATED_COMMANDS = {'ingest': ingest, 'replay': replay, 'generate': generate}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='fishapp', description="Fish farm data pipeline")
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for name, command in DELEGATED_COMMANDS.items():
+        # Their own parser prints the options, so no -h here
+        commands.add_parser(name, help=command.__doc__, add_help=False)
+
+    inspect_parser = commands.add_parser('inspect', help='summarize a readings CSV and the local pipeline state')
+    inspect_parser.add_argument('csv', nargs='?', help='readings CSV to load (skip to only show the local state)')
+    inspect_parser.add_argument('--no-cache', action='store_true', help='parse the CSV even if a cached copy exists')
+    inspect_parser.add_argument('--source-tz', help='timezone of the naive CSV timestamps (default: UTC)')
+
+    schema_parser = commands.add_parser('schema', help='print the SQL that creates the Supabase tables')
+    schema_parser.add_argument('tables', nargs='*', help='only these tables (default: all)')
+    schema_parser.add_argument('--sqlite', action='store_true', help='the schema of the local SQLite sink instead')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.command in DELEGATED_COMMANDS:
+        # Everything after the command name goes to the delegated parser, in order
+        command_argv = argv[argv.index(args.command) + 1:]
+        DELEGATED_COMMANDS[args.command](command_argv, f'fishapp {args.command}')
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    elif args.command == 'inspect':
+        inspect(args)
+    else:
+        schema(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
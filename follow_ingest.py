@@ -0,0 +1,256 @@
+import json
+import os
+import queue
+import threading
+import time
+from itertools import groupby
+
+# Committed position of every followed file: path -> inode and byte offset
+FOLLOW_OFFSETS_FILE = os.path.join('.fishapp', 'follow_offsets.json')
+
+# A micro-batch is flushed at this many rows or once its oldest row waited this long
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_DELAY = 1.0
+
+# How often a file is checked for new lines while it is idle
+DEFAULT_POLL_INTERVAL = 0.1
+
+# Bytes read from a file per call, so a long backlog is cut into micro-batches as it is read
+READ_SIZE = 1 << 20
+
+# Lines of a stream read ahead of the upload; a full queue holds the writer back
+STREAM_QUEUE_LINES = 10000
+
+
+def load_offsets(path=FOLLOW_OFFSETS_FILE):
+    """{absolute path: {'inode', 'offset'}} committed by earlier runs ({} if none)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_offsets(offsets, path=FOLLOW_OFFSETS_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(offsets, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def find_rotated(path, inode):
+    """The file in path's directory with the given inode (path renamed by log rotation), or None"""
+    directory = os.path.dirname(os.path.abspath(path))
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.inode() == inode:
+            return entry.path
+    return None
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class FileTail:
+    """Complete lines appended to a CSV, with the byte offset after each, across log rotation.
+
+    position ({'inode', 'offset'}, as committed earlier) resumes after the
+    last committed line: in the file at path when it is the same file,
+    otherwise in the file it was rotated to (found by inode next to it),
+    which is read to its end before the new file at path. A file replaced
+    at path is read to its end before switching; a file truncated in place
+    is read again from its start. The first line of every file is its
+    header and is not returned. A last line without a newline is only
+    returned once its file was rotated away.
+    """
+
+    closed = False
+
+    def __init__(self, path, position=None):
+        self.path = path
+        self.header = None
+        self.inode = None
+        self.skipped = None
+        self._file = None
+        self._buffer = b''
+        self._offset = 0
+        if position:
+            source = path if _inode(path) == position['inode'] else find_rotated(path, position['inode'])
+            if source is not None:
+                self._open(source, position['offset'])
+            else:
+                # Rotated away and gone (compressed or deleted): what was left of it is lost
+                self.skipped = position
+        if self._file is None:
+            self._open(path)
+
+    def _open(self, source, offset=0):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            f = open(source, 'rb')
+        except FileNotFoundError:
+            return
+        self._file, self.inode, self._buffer = f, os.fstat(f.fileno()).st_ino, b''
+        self.header = None
+        if offset:
+            self.header = f.readline()
+            f.seek(offset)
+        self._offset = offset
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _lines(self, data, final=False):
+        """[(line, offset after it)] of the complete lines in the buffer plus data"""
+        self._buffer += data
+        end = len(self._buffer) if final else self._buffer.rfind(b'\n') + 1
+        complete, self._buffer = self._buffer[:end], self._buffer[end:]
+        lines = []
+        for line in complete.splitlines(keepends=True):
+            self._offset += len(line)
+            if self.header is None:
+                self.header = line
+            elif line.strip():
+                lines.append((line, self._offset))
+        return lines
+
+    def read(self):
+        """The lines appended since the last call (an empty list when there are none yet)"""
+        if self._file is None:
+            self._open(self.path)
+            if self._file is None:
+                return []
+        data = self._file.read(READ_SIZE)
+        if data:
+            return self._lines(data)
+
+        current = _inode(self.path)
+        if current is not None and current != self.inode:
+            # Rotated: finish the old file (it may have grown just before the switch), then move on
+            data = self._file.read(READ_SIZE)
+            if data:
+                return self._lines(data)
+            lines = self._lines(b'', final=True)
+            if not lines:
+                # Only switch once every line of the old file was returned (and can be committed)
+                self._open(self.path)
+            return lines
+        if current == self.inode and os.fstat(self._file.fileno()).st_size < self._file.tell():
+            # Truncated in place (copytruncate): start over
+            self._open(self.path)
+        return []
+
+
+class StreamLines:
+    """Lines of a stream such as stdin, read on a background thread.
+
+    A pipe can't be resumed, so there are no offsets to commit; closed is
+    set once the stream ended and every line was returned.
+    """
+
+    inode = None
+    skipped = None
+
+    def __init__(self, stream):
+        self.header = None
+        self.closed = False
+        self._queue = queue.Queue(maxsize=STREAM_QUEUE_LINES)
+        self._thread = threading.Thread(target=self._run, args=(stream,), name='stdin-reader', daemon=True)
+        self._thread.start()
+
+    def _run(self, stream):
+        for line in iter(stream.readline, b''):
+            self._queue.put(line)
+        self._queue.put(None)
+
+    def read(self):
+        lines = []
+        while True:
+            try:
+                line = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if line is None:
+                self.closed = True
+                break
+            if self.header is None:
+                self.header = line
+            elif line.strip():
+                lines.append((line, None))
+        return lines
+
+    def close(self):
+        pass
+
+
+def follow(source, flush, max_rows=DEFAULT_MAX_ROWS, max_delay=DEFAULT_MAX_DELAY,
+           poll_interval=DEFAULT_POLL_INTERVAL, idle_exit=None, on_commit=None, metrics=None):
+    """Hand the lines of source to flush(header, lines) in micro-batches until it ends.
+
+    A micro-batch is flushed when it holds max_rows lines or its oldest
+    line has waited max_delay seconds, whichever comes first, and before
+    the source moves on to another file. flush must return once the rows
+    are stored (uploaded, or kept in the dead-letter file); then
+    on_commit(position) saves the position after the batch and metrics (a
+    RunMetrics) records how long each row took from being read to being
+    committed. Runs until the stream ends, idle_exit seconds pass without
+    a new line (None: never) or Ctrl-C, after flushing what was read.
+    Returns the number of rows committed.
+    """
+    lines, ends, arrivals = [], [], []
+    batch = {'header': None, 'inode': None}
+    committed = 0
+
+    def flush_batch(count):
+        nonlocal committed
+        flush(batch['header'], lines[:count])
+        if on_commit is not None and ends[count - 1] is not None:
+            # The inode of the batch's file: the source may have moved on to the next one
+            on_commit({'inode': batch['inode'], 'offset': ends[count - 1]})
+        now = time.monotonic()
+        if metrics is not None:
+            for arrived, group in groupby(arrivals[:count]):
+                metrics.observe_commit_latency(now - arrived, sum(1 for _ in group))
+        del lines[:count], ends[:count], arrivals[:count]
+        committed += count
+
+    last_line = time.monotonic()
+    try:
+        while True:
+            new = source.read()
+            now = time.monotonic()
+            if lines and (source.inode != batch['inode'] or source.header != batch['header']):
+                flush_batch(len(lines))
+            if new:
+                last_line = now
+                if not lines:
+                    batch['header'], batch['inode'] = source.header, source.inode
+                for line, end in new:
+                    lines.append(line)
+                    ends.append(end)
+                    arrivals.append(now)
+            while len(lines) >= max_rows:
+                flush_batch(max_rows)
+            if lines and (now - arrivals[0] >= max_delay or source.closed):
+                flush_batch(len(lines))
+            if source.closed:
+                break
+            if idle_exit is not None and not lines and now - last_line >= idle_exit:
+                break
+            if not new:
+                wait = poll_interval if not lines else max(0.0, min(poll_interval, arrivals[0] + max_delay - now))
+                time.sleep(wait)
+    except KeyboardInterrupt:
+        if lines:
+            flush_batch(len(lines))
+    finally:
+        source.close()
+    return committed
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Parsed source files, one directory of memory-mappable .npy columns per file
+FRAME_CACHE_DIR = os.path.join('.fishapp', 'frames')
+
+# Bump when the on-disk layout changes so old entries are rebuilt. What a reader
+# builds is versioned in its reader key instead: bump that version (for example
+# sensor_frames.FRAME_VERSION) whenever the reader's transform changes
+CACHE_VERSION = 1
+
+MANIFEST = 'manifest.json'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """BLAKE2b hex digest of a file's content"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _entry_dir(path, reader, options, cache_dir):
+    """Cache directory of one (source file, reader, reader options) combination"""
+    identity = json.dumps([os.path.abspath(path), reader, options], sort_keys=True, default=repr)
+    return os.path.join(cache_dir, hashlib.blake2b(identity.encode(), digest_size=12).hexdigest())
+
+
+def _read_manifest(entry):
+    try:
+        with open(os.path.join(entry, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(entry, manifest):
+    tmp_path = os.path.join(entry, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(entry, MANIFEST))
+
+
+def _is_fresh(entry, manifest, stat, path):
+    """True when the cached frame still matches the source file.
+
+    Same size and mtime: trusted without reading the file. Same size but a
+    new mtime (touched, copied, checked out again): the content hash decides,
+    and a match records the new mtime so the next check is cheap again.
+    """
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if manifest['size'] != stat.st_size:
+        return False
+    if manifest['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    if manifest['digest'] != file_digest(path):
+        return False
+    manifest['mtime_ns'] = stat.st_mtime_ns
+    _write_manifest(entry, manifest)
+    return True
+
+
+def _cacheable(df):
+    """Only plain columns round-trip exactly: numpy dtypes, all-string and string-categorical columns"""
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        return False
+    for _, series in df.items():
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if pd.api.types.infer_dtype(series.cat.categories, skipna=True) in ('string', 'empty'):
+                continue
+            return False
+        if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+            continue
+        return False
+    return True
+
+
+def _save_frame(df, entry):
+    """Write df as one .npy file per column; strings as category codes + categories"""
+    columns = []
+    for position, (name, series) in enumerate(df.items()):
+        filename = f"col{position}.npy"
+        column = {'name': name, 'dtype': str(series.dtype), 'file': filename}
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+            np.save(os.path.join(entry, filename), series.to_numpy())
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            # Kept categorical on load, with its own codes and category order
+            np.save(os.path.join(entry, filename), series.cat.codes.to_numpy())
+            column['categories'] = series.cat.categories.tolist()
+            column['categorical'] = True
+        else:
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            np.save(os.path.join(entry, filename), codes.astype(np.int32))
+            column['categories'] = categories.tolist()
+        columns.append(column)
+    return columns
+
+
+def _load_frame(entry, manifest):
+    """Rebuild the frame; numeric columns stay memory-mapped (read-only)"""
+    data = {}
+    for column in manifest['columns']:
+        # Plain ndarray view of the mapping, so results of operations aren't memmaps
+        values = np.load(os.path.join(entry, column['file']), mmap_mode='r').view(np.ndarray)
+        if column.get('categorical'):
+            data[column['name']] = pd.Categorical.from_codes(values, pd.Index(column['categories']))
+        elif 'categories' in column:
+            categories = pd.Index(column['categories'], dtype=object)
+            values = pd.Categorical.from_codes(values, categories).astype(object)
+            data[column['name']] = pd.Series(values, copy=False).astype(column['dtype'])
+        else:
+            data[column['name']] = values
+    df = pd.DataFrame(data, index=pd.RangeIndex(manifest['rows']), columns=[c['name'] for c in manifest['columns']],
+                      copy=False)
+    df.attrs.update(manifest.get('attrs', {}))
+    return df
+
+
+def _store(df, path, entry, reader, options, stat):
+    """Write a new cache entry next to the old one and swap it in"""
+    parent = os.path.dirname(entry)
+    os.makedirs(parent, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(prefix='.building-', dir=parent)
+    try:
+        columns = _save_frame(df, tmp_entry)
+        _write_manifest(tmp_entry, {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(path),
+            'reader': reader,
+            'options': json.loads(json.dumps(options, default=repr)),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'digest': file_digest(path),
+            'rows': len(df),
+            'columns': columns,
+            # Metadata the loader attached (must be JSON-serializable)
+            'attrs': json.loads(json.dumps(df.attrs, default=repr))
+        })
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # Another process won the race, or the disk is read-only: the parsed frame is still good
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def cached_frame(path, reader, load, options=None, cache_dir=FRAME_CACHE_DIR):
+    """Return load(path, **options), served from the columnar cache when the source is unchanged.
+
+    reader names the parser ('csv', 'excel', 'sensor-csv-v2') and is part
+    of the cache key together with the file path and options; a reader
+    whose output changes needs a new name (a version suffix) so frames
+    built by the old code are not served. Freshness is checked against
+    the file's size, mtime and content hash. The frame's attrs are cached
+    along with its columns.
+    """
+    options = options or {}
+    stat = os.stat(path)
+    entry = _entry_dir(path, reader, options, cache_dir)
+    manifest = _read_manifest(entry)
+    if _is_fresh(entry, manifest, stat, path):
+        try:
+            return _load_frame(entry, manifest)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    df = load(path, **options)
+    if _cacheable(df):
+        _store(df, path, entry, reader, options, stat)
+    return df
+
+
+def read_csv_cached(path, cache_dir=FRAME_CACHE_DIR, **read_csv_options):
+    """pd.read_csv through the columnar cache"""
+    return cached_frame(path, 'csv', pd.read_csv, read_csv_options, cache_dir)
+
+
+def read_excel_cached(path, cache_dir=FRAME_CACHE_DIR, **read_excel_options):
+    """pd.read_excel through the columnar cache (skips the Excel engine on warm runs)"""
+    return cached_frame(path, 'excel', pd.read_excel, read_excel_options, cache_dir)
+
+
+def clear_frame_cache(cache_dir=FRAME_CACHE_DIR):
+    """Delete every cached frame"""
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -1,10 +1,12 @@
 import pandas as pd
+from sensor_frames import load_sensor_frame, memory_report
 
 # Load the expanded dataset
-data = pd.read_csv('Datos_Ficticios_Granjas_Expandido.csv')
+data, timestamp_failures = load_sensor_frame('Datos_Ficticios_Granjas_Expandido.csv')
 
 print("Dataset loaded successfully!")
 print(f"Shape: {data.shape}")
+print(f"Memory: {memory_report(data)}")
 print(f"\nColumns: {list(data.columns)}")
 print(f"\nPonds in dataset: {sorted(data['pond_id'].unique())}")
 print(f"\nData types:")
@@ -1,12 +1,14 @@
 # Code to use in your Jupyter notebook to load the expanded dataset
 
 import pandas as pd
+from sensor_frames import load_sensor_frame, memory_report
 
 # Load the expanded dataset with 15 ponds (A-O)
-data = pd.read_csv('Datos_Ficticios_Granjas_Expandido.csv')
+data, timestamp_failures = load_sensor_frame('Datos_Ficticios_Granjas_Expandido.csv')
 
 print(f"Dataset loaded successfully!")
 print(f"Shape: {data.shape}")
+print(f"Memory: {memory_report(data)}")
 print(f"Number of ponds: {len(data['pond_id'].unique())}")
 print(f"Ponds: {sorted(data['pond_id'].unique())}")
 print(f"Time range: {data['timestamp'].min()} to {data['timestamp'].max()}")
@@ -0,0 +1,181 @@
+import string
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Generated metrics in CSV column order; Rain_mm and Aerator_Status are drawn separately
+METRICS = [
+    'OD_mg_L', 'Temp_C', 'pH', 'Conductivity_uScm', 'PAR_umol_m2s', 'Ammonia_mg_L',
+    'Nitrite_mg_L', 'Turbidity_NTU', 'Chlorophyll_ug_L', 'AirPressure_hPa', 'Wind_m_s',
+    'Flow_m3_h', 'Lirio_Coverage_pct'
+]
+
+CSV_COLUMNS = ['timestamp', 'pond_id'] + METRICS[:11] + ['Rain_mm'] + METRICS[11:] + ['Aerator_Status']
+
+# Range each pond's base level is drawn from
+BASE_RANGES = {
+    'OD_mg_L': (6.5, 8.5),
+    'Temp_C': (24, 29),
+    'pH': (7.3, 7.9),
+    'Conductivity_uScm': (490, 560),
+    'PAR_umol_m2s': (200, 800),
+    'Ammonia_mg_L': (0.3, 0.8),
+    'Nitrite_mg_L': (0.01, 0.25),
+    'Turbidity_NTU': (5, 35),
+    'Chlorophyll_ug_L': (15, 40),
+    'AirPressure_hPa': (1005, 1020),
+    'Wind_m_s': (0, 5),
+    'Flow_m3_h': (80, 130),
+    'Lirio_Coverage_pct': (7, 15)
+}
+
+# Rain is occasional: mostly 0 mm, sometimes 1 or 2
+RAIN_VALUES = np.array([0, 1, 2])
+RAIN_PROBABILITIES = np.array([0.99, 0.005, 0.005])
+
+# Relative standard deviation of the per-reading noise
+NOISE = 0.05
+
+# Timestamps per block; every (pond, block) has its own RNG stream, so a
+# block can be generated by any process and the output doesn't depend on
+# how the work was split
+BLOCK_STEPS = 288
+
+_METRIC_INDEX = {metric: i for i, metric in enumerate(METRICS)}
+
+
+def pond_name(index):
+    """Pond id in spreadsheet-column style: 0 -> Pond_A, 25 -> Pond_Z, 26 -> Pond_AA, ..."""
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = string.ascii_uppercase[remainder] + label
+    return f"Pond_{label}"
+
+
+def metric_bounds(df):
+    """(low, high) arrays of every metric, taken from an existing dataset"""
+    return df[METRICS].min().to_numpy(dtype='float64'), df[METRICS].max().to_numpy(dtype='float64')
+
+
+def pond_bases(seed, pond_indices):
+    """(ponds, metrics) array of base levels, one seeded stream per pond"""
+    low = np.array([BASE_RANGES[metric][0] for metric in METRICS], dtype='float64')
+    high = np.array([BASE_RANGES[metric][1] for metric in METRICS], dtype='float64')
+    bases = np.empty((len(pond_indices), len(METRICS)))
+    for row, pond in enumerate(pond_indices):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(pond,)))
+        bases[row] = rng.uniform(low, high)
+    return bases
+
+
+def daily_cycle(hours):
+    """(steps, metrics) multiplicative and additive time-of-day patterns"""
+    scale = np.ones((len(hours), len(METRICS)))
+    offset = np.zeros((len(hours), len(METRICS)))
+    # Temperature and pH follow the sun and photosynthesis
+    offset[:, _METRIC_INDEX['Temp_C']] = 2 * np.sin(2 * np.pi * (hours - 6) / 24)
+    offset[:, _METRIC_INDEX['pH']] = 0.1 * np.sin(2 * np.pi * (hours - 12) / 24)
+    # PAR (light) is 0 at night and peaks at noon
+    daylight = (hours >= 6) & (hours <= 18)
+    scale[:, _METRIC_INDEX['PAR_umol_m2s']] = np.where(daylight, 1 + 0.5 * np.sin(np.pi * (hours - 6) / 12), 0)
+    return scale, offset
+
+
+def csv_timestamp_labels(times):
+    """Format datetimes like the source CSV: '01/08/25 0:00' (hour without leading zero)"""
+    times = pd.DatetimeIndex(times)
+    return times.strftime('%d/%m/%y ') + times.hour.astype(str) + times.strftime(':%M')
+
+
+def generate_block(times, pond_indices, bases, bounds, seed, block):
+    """Readings of every pond at the given timestamps as a DataFrame, time-major.
+
+    Computed on a (pond, time, metric) grid: base levels (pond, 1, metric)
+    are broadcast against the daily cycle (1, time, metric) and the noise.
+    """
+    times = pd.DatetimeIndex(times)
+    steps, ponds = len(times), len(pond_indices)
+    scale, offset = daily_cycle(times.hour.to_numpy())
+    expected = bases[:, None, :] * scale[None] + offset[None]
+
+    noise = np.empty((ponds, steps, len(METRICS)))
+    draws = np.empty((ponds, steps, 2))
+    for row, pond in enumerate(pond_indices):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(pond, block)))
+        noise[row] = rng.standard_normal((steps, len(METRICS)))
+        draws[row] = rng.random((steps, 2))
+
+    low, high = bounds
+    values = np.clip(expected * (1 + NOISE * noise), low, high)
+    rain = RAIN_VALUES[np.searchsorted(np.cumsum(RAIN_PROBABILITIES), draws[..., 0], side='right')]
+    aerator = (draws[..., 1] < 0.5).astype('int64')
+
+    # (pond, time, ...) -> rows ordered by time, then pond
+    values = values.transpose(1, 0, 2).reshape(steps * ponds, len(METRICS))
+    frame = pd.DataFrame(values, columns=METRICS)
+    frame.insert(0, 'timestamp', np.repeat(csv_timestamp_labels(times).to_numpy(), ponds))
+    frame.insert(1, 'pond_id', np.tile(np.array([pond_name(pond) for pond in pond_indices], dtype=object), steps))
+    frame['Rain_mm'] = rain.T.reshape(-1)
+    frame['Aerator_Status'] = aerator.T.reshape(-1)
+    return frame[CSV_COLUMNS]
+
+
+def iter_blocks(times, block_steps=BLOCK_STEPS):
+    """Yield (block number, timestamps of the block) over the whole time grid"""
+    times = pd.DatetimeIndex(times)
+    for block, start in enumerate(range(0, len(times), block_steps)):
+        yield block, times[start:start + block_steps]
+
+
+def generate_frames(times, pond_indices, bounds, seed=42, block_steps=BLOCK_STEPS):
+    """Yield the generated readings block by block (memory: one block of all ponds)"""
+    pond_indices = list(pond_indices)
+    bases = pond_bases(seed, pond_indices)
+    for block, block_times in iter_blocks(times, block_steps):
+        yield generate_block(block_times, pond_indices, bases, bounds, seed, block)
+
+
+def _render_block(args):
+    """Worker: one block as CSV text (formatting is the expensive part)"""
+    block_times, pond_indices, bases, bounds, seed, block = args
+    return generate_block(block_times, pond_indices, bases, bounds, seed, block).to_csv(index=False, header=False)
+
+
+def write_csv(path, times, pond_indices, bounds, seed=42, block_steps=BLOCK_STEPS, workers=1):
+    """Stream generated readings to a CSV, one block at a time; returns rows written.
+
+    With workers > 1 blocks are generated and formatted in a process pool and
+    written in order, at most two blocks per worker ahead of the writer; the
+    file is identical to a single-process run.
+    """
+    pond_indices = list(pond_indices)
+    bases = pond_bases(seed, pond_indices)
+    tasks = ((block_times, pond_indices, bases, bounds, seed, block)
+             for block, block_times in iter_blocks(times, block_steps))
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(CSV_COLUMNS) + '\n')
+        if workers <= 1:
+            for task in tasks:
+                text = _render_block(task)
+                f.write(text)
+                rows += text.count('\n')
+            return rows
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_render_block, task))
+                if len(pending) >= 2 * workers:
+                    text = pending.popleft().result()
+                    f.write(text)
+                    rows += text.count('\n')
+            while pending:
+                text = pending.popleft().result()
+                f.write(text)
+                rows += text.count('\n')
+    return rows
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+
+from upload_errors import is_transient
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter and a retry budget shared by a whole run.
+
+    Attempt n (0-based) of a transient failure waits a random time in
+    [0, min(max_delay, base_delay * 2**n)]. Each retry spends one unit of
+    `budget`; once it is spent, failures are final straight away so a dead
+    link can't stall the run for max_attempts * max_delay per batch.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0, budget=200,
+                 sleep=time.sleep, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retries = 0
+        self._sleep = sleep
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        """Seconds to wait before retrying after failed attempt number `attempt`"""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        with self._lock:
+            return self._random.uniform(0, cap)
+
+    def _take_budget(self):
+        with self._lock:
+            if self.budget is not None and self.retries >= self.budget:
+                return False
+            self.retries += 1
+            return True
+
+    def should_retry(self, error, attempt):
+        """Decide (and pay for) a retry after failed attempt number `attempt`"""
+        if attempt + 1 >= self.max_attempts or not is_transient(error):
+            return False
+        return self._take_budget()
+
+    def call(self, func, on_attempt=None):
+        """Call func() until it succeeds or fails for good.
+
+        on_attempt(seconds, error) is called after every attempt.
+        Returns (result, error, attempts); error is None on success.
+        """
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = func()
+                error = None
+            except Exception as e:
+                result, error = None, e
+            if on_attempt is not None:
+                on_attempt(time.perf_counter() - start, error)
+            if error is None or not self.should_retry(error, attempt):
+                return result, error, attempt + 1
+            self._sleep(self.delay(attempt))
+            attempt += 1
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from column_mapping import TABLE_COLUMNS, build_records
+from timestamp_parsing import format_timestamps
+
+# Companion tables of per-farm, per-metric aggregates, see create_tables.sql
+ROLLUP_TABLES = {
+    'h': 'metric_rollups_hourly',
+    'D': 'metric_rollups_daily'
+}
+ROLLUP_CONFLICT_COLUMNS = 'farm_id,metric,bucket'
+
+# Every uploaded reading column, by CSV column; the rollup's metric is the table column name
+ROLLUP_METRICS = {source: target for mapping in TABLE_COLUMNS.values() for source, target in mapping.items()}
+
+# Days of stored readings read back and aggregated at a time
+DAYS_PER_FETCH = 7
+
+# Touched-bucket frames kept before they are combined into one
+_MAX_TOUCHED = 16
+
+_KEYS = ['pond_id', 'metric', 'bucket']
+
+
+def partial_rollups(df, freq='h'):
+    """min, max, sum, count, last and last_timestamp of every (pond_id, metric, bucket) in df.
+
+    df needs parsed timestamps; missing readings are not counted.
+    """
+    metrics = [source for source in ROLLUP_METRICS if source in df.columns]
+    frame = df[['pond_id', 'timestamp'] + metrics].copy()
+    frame[metrics] = frame[metrics].astype('float64')
+    frame['bucket'] = frame['timestamp'].dt.floor(freq)
+    # Within a bucket the newest reading comes last
+    grouped = frame.sort_values('timestamp', kind='stable').groupby(['pond_id', 'bucket'], sort=False)
+
+    values = grouped[metrics]
+    parts = {
+        'min': values.min(),
+        'max': values.max(),
+        'sum': values.sum(),
+        'count': values.count(),
+        'last': values.last()
+    }
+    last_timestamps = grouped['timestamp'].max()
+    long = pd.DataFrame({name: part.rename(columns=ROLLUP_METRICS).stack()
+                         for name, part in parts.items()})
+    long.index.names = ['pond_id', 'bucket', 'metric']
+    long = long.reset_index()
+    long['last_timestamp'] = last_timestamps.reindex(pd.MultiIndex.from_frame(long[['pond_id', 'bucket']])).to_numpy()
+    return long.loc[long['count'].to_numpy() > 0, _KEYS + ['min', 'max', 'sum', 'count', 'last', 'last_timestamp']]
+
+
+def combine_rollups(partials, freq=None):
+    """Merge partial aggregates of the same buckets (re-bucketed to freq when given)"""
+    frame = pd.concat(partials, ignore_index=True)
+    if freq is not None:
+        frame['bucket'] = frame['bucket'].dt.floor(freq)
+    grouped = frame.groupby(_KEYS, sort=True)
+    combined = grouped.agg(min=('min', 'min'), max=('max', 'max'), sum=('sum', 'sum'), count=('count', 'sum'))
+    newest = frame.sort_values('last_timestamp', kind='stable').groupby(_KEYS, sort=True)
+    combined['last'] = newest['last'].last()
+    combined['last_timestamp'] = newest['last_timestamp'].last()
+    return combined.reset_index()
+
+
+def stored_frame(rows, mapping):
+    """Stored rows of a readings table (farm_id, timestamp and mapping's columns) as partial_rollups input"""
+    frame = pd.DataFrame(list(rows), columns=['farm_id', 'timestamp', *mapping.values()])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True, format='ISO8601').dt.tz_localize(None)
+    return frame.rename(columns={'farm_id': 'pond_id', **{target: source for source, target in mapping.items()}})
+
+
+def fetch_windows(days, span=DAYS_PER_FETCH):
+    """(first day, day after the last) ranges of at most span days that cover the sorted days"""
+    windows = []
+    for day in days:
+        if windows and day - windows[-1][0] < pd.Timedelta(days=span):
+            windows[-1][1] = day + pd.Timedelta(days=1)
+        else:
+            windows.append([day, day + pd.Timedelta(days=1)])
+    return windows
+
+
+class RollupAccumulator:
+    """The hourly and daily buckets that received rows during one ingest run.
+
+    add() marks the buckets of the rows being uploaded (a whole file or
+    chunk after chunk). Once they are stored, records() rebuilds every
+    touched bucket from the readings the sink holds for it, so a bucket
+    filled by several files or runs, re-sent or updated rows and late
+    readings come out as if everything had been ingested at once.
+    """
+
+    def __init__(self):
+        self._touched = []
+
+    def add(self, df, touched=None):
+        """Mark the buckets of df; touched is a boolean mask of the rows being uploaded (default: all)"""
+        rows = df if touched is None else df.loc[np.asarray(touched)]
+        if rows.empty:
+            return
+        # One row per touched (pond, hour), not per reading
+        self._touched.append(pd.DataFrame({'pond_id': rows['pond_id'].to_numpy(),
+                                           'bucket': rows['timestamp'].dt.floor('h').to_numpy()}).drop_duplicates())
+        if len(self._touched) >= _MAX_TOUCHED:
+            self._touched = [pd.concat(self._touched).drop_duplicates()]
+
+    def records(self, farm_id_map, fetch_readings):
+        """{rollup table: rows} of the touched hours and days, keyed on farm ids from farm_id_map.
+
+        fetch_readings(table_name, columns, farm_ids, start, end) returns the
+        stored rows (farm_id, timestamp and columns) of farm_ids from start
+        up to, not including, end. They are read DAYS_PER_FETCH days at a time.
+        """
+        payloads = {table_name: [] for table_name in ROLLUP_TABLES.values()}
+        if not self._touched:
+            return payloads
+        touched = pd.concat(self._touched).drop_duplicates()
+        farm_ids = touched['pond_id'].map(farm_id_map)
+        touched = pd.DataFrame({'pond_id': farm_ids.dropna().to_numpy(dtype='int64'),
+                                'bucket': touched['bucket'].to_numpy()[farm_ids.notna().to_numpy()]})
+        days = touched['bucket'].dt.floor('D')
+
+        for start, end in fetch_windows(sorted(days.unique())):
+            window = touched.loc[((days >= start) & (days < end)).to_numpy()]
+            farms = sorted(set(window['pond_id'].tolist()))
+            first, last = format_timestamps([start, end])
+            partials = []
+            for table_name, mapping in TABLE_COLUMNS.items():
+                frame = stored_frame(fetch_readings(table_name, list(mapping.values()), farms, first, last), mapping)
+                if not frame.empty:
+                    partials.append(partial_rollups(frame, 'h'))
+            if not partials:
+                continue
+            hourly = combine_rollups(partials)
+            for freq, table_name in ROLLUP_TABLES.items():
+                rollups = hourly if freq == 'h' else combine_rollups([hourly], freq)
+                buckets = pd.MultiIndex.from_arrays([window['pond_id'], window['bucket'].dt.floor(freq)])
+                rollups = rollups.loc[pd.MultiIndex.from_arrays([rollups['pond_id'], rollups['bucket']]).isin(buckets)]
+                payloads[table_name].extend(build_records({
+                    'farm_id': rollups['pond_id'].to_numpy(dtype='int64').tolist(),
+                    'metric': rollups['metric'].tolist(),
+                    'bucket': format_timestamps(rollups['bucket']),
+                    'min_value': rollups['min'].tolist(),
+                    'max_value': rollups['max'].tolist(),
+                    'mean_value': (rollups['sum'] / rollups['count']).tolist(),
+                    'sum_value': rollups['sum'].tolist(),
+                    'sample_count': rollups['count'].to_numpy(dtype='int64').tolist(),
+                    'last_value': rollups['last'].tolist(),
+                    'last_timestamp': format_timestamps(rollups['last_timestamp'])
+                }))
+        return payloads
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from column_mapping import TABLE_COLUMNS, project_tables
+
+# (table, farm, timestamp) -> content hash of every row uploaded so far
+ROW_HASH_CACHE_FILE = os.path.join('.fishapp', 'row_hashes.sqlite')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS row_hashes (
+    table_name TEXT NOT NULL,
+    farm TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    PRIMARY KEY (table_name, farm, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pending_row_hashes (
+    table_name TEXT NOT NULL,
+    farm TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    PRIMARY KEY (table_name, farm, ts)
+) WITHOUT ROWID;
+"""
+
+
+def row_hashes(df, table_name):
+    """64-bit content hash of the columns a table is built from, one per row"""
+    columns = list(TABLE_COLUMNS[table_name])
+    # SQLite integers are signed 64-bit
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy().view(np.int64)
+
+
+def estimate_payload_bytes(df, table_name, sample_size=50):
+    """Approximate JSON bytes the rows of df would take in table_name's payload"""
+    if df.empty:
+        return 0
+    sample = df.head(sample_size)
+    farm_ids = {farm: 1 for farm in sample['pond_id'].unique()}
+    records = project_tables(sample, farm_ids, {table_name: TABLE_COLUMNS[table_name]})[table_name]
+    return int(len(json.dumps(records)) / len(sample) * len(df))
+
+
+class RowHashCache:
+    """Local SQLite index of row content hashes used to skip unchanged rows.
+
+    filter_changed() stages the hashes of the rows it lets through;
+    commit(table) moves them into the index once that table uploaded fully,
+    discard(table) drops them otherwise, so a failed upload is retried on the
+    next run. Timestamps are stored as epoch seconds so old entries can be
+    pruned by time.
+    """
+
+    def __init__(self, path=ROW_HASH_CACHE_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.skipped_rows = {}
+        self.skipped_bytes = {}
+        self._lock = threading.Lock()
+        # Used from the streaming producer thread as well as the main thread
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stored(self, table_name, epochs):
+        """Stored (farm, ts, hash) rows in the time range of epochs"""
+        rows = self._db.execute(
+            "SELECT farm, ts, hash FROM row_hashes WHERE table_name = ? AND ts BETWEEN ? AND ?",
+            (table_name, int(epochs.min()), int(epochs.max()))
+        ).fetchall()
+        return pd.DataFrame(rows, columns=['farm', 'ts', 'stored_hash'])
+
+    def filter_changed(self, df, table_name, timestamps):
+        """Boolean array of rows that are new or changed since they were last uploaded.
+
+        timestamps holds each row's parsed timestamp; rows where it is NaT
+        are always sent.
+        """
+        valid = timestamps.notna().to_numpy()
+        epochs = timestamps.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        keys = pd.DataFrame({'farm': df['pond_id'].to_numpy(), 'ts': epochs, 'hash': row_hashes(df, table_name)})
+        keys = keys.loc[valid]
+        changed = np.ones(len(df), dtype=bool)
+        with self._lock:
+            if valid.any():
+                stored = self._stored(table_name, keys['ts'])
+                if not stored.empty:
+                    merged = keys.merge(stored, on=['farm', 'ts'], how='left')
+                    changed[valid] = (merged['stored_hash'] != merged['hash']).to_numpy()
+            staged = keys.loc[changed[valid]]
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pending_row_hashes VALUES (?, ?, ?, ?)",
+                zip([table_name] * len(staged), staged['farm'].tolist(),
+                    staged['ts'].tolist(), staged['hash'].tolist())
+            )
+            self._db.commit()
+
+        skipped = int((~changed).sum())
+        if skipped:
+            self.skipped_rows[table_name] = self.skipped_rows.get(table_name, 0) + skipped
+            self.skipped_bytes[table_name] = (self.skipped_bytes.get(table_name, 0)
+                                              + estimate_payload_bytes(df.loc[~changed], table_name))
+        return changed
+
+    def commit(self, table_name):
+        """Remember the staged hashes of a table whose upload succeeded"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO row_hashes "
+                "SELECT table_name, farm, ts, hash FROM pending_row_hashes WHERE table_name = ?",
+                (table_name,)
+            )
+            self._db.execute("DELETE FROM pending_row_hashes WHERE table_name = ?", (table_name,))
+            self._db.commit()
+
+    def discard(self, table_name):
+        """Forget the staged hashes of a table whose upload failed"""
+        with self._lock:
+            self._db.execute("DELETE FROM pending_row_hashes WHERE table_name = ?", (table_name,))
+            self._db.commit()
+
+    def prune(self, keep_days):
+        """Drop entries more than keep_days older than the newest entry of their table"""
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM row_hashes WHERE ts < "
+                "(SELECT MAX(ts) FROM row_hashes AS newest WHERE newest.table_name = row_hashes.table_name) - ?",
+                (int(keep_days * 86400),)
+            ).rowcount
+            self._db.commit()
+            self._db.execute("VACUUM")
+        return deleted
+
+    def report(self):
+        """{table_name: (rows skipped, payload bytes avoided)} for this run"""
+        return {table_name: (rows, self.skipped_bytes.get(table_name, 0))
+                for table_name, rows in self.skipped_rows.items()}
@@ -0,0 +1,288 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+METRICS_TEXTFILE = os.path.join('.fishapp', 'metrics.prom')
+RUN_SUMMARY_FILE = os.path.join('.fishapp', 'run_summary.json')
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Upper bounds (seconds) of the ingest-to-commit latency buckets of follow mode
+COMMIT_LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 60.0)
+
+# Per-table counters, with the help text of their Prometheus gauges
+TABLE_COUNTERS = {
+    'rows': 'Rows uploaded in the last run',
+    'batches': 'Batches uploaded in the last run',
+    'failed_batches': 'Batches that failed for good in the last run',
+    'retries': 'Retried upsert attempts in the last run',
+    'request_bytes': 'Request body bytes sent in the last run (after compression)',
+    'body_bytes': 'Request body bytes encoded in the last run (before compression)',
+    'quarantined_rows': 'Rows that failed schema validation in the last run',
+    'rejected_rows': 'Rows the server rejected, isolated by bisecting failed batches in the last run',
+    'bisect_requests': 'Extra upsert requests spent bisecting failed batches in the last run'
+}
+
+PROMETHEUS_PREFIX = 'fishapp_ingest'
+
+
+def timed(metrics, stage):
+    """metrics.timer(stage), or a no-op when metrics is None"""
+    return nullcontext() if metrics is None else metrics.timer(stage)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _new_histogram(buckets):
+    return {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+
+
+def _observe(histogram, buckets, seconds, count=1):
+    for i, bound in enumerate(buckets):
+        if seconds <= bound:
+            histogram['buckets'][i] += count
+            break
+    histogram['sum'] += seconds * count
+    histogram['count'] += count
+
+
+def _quantile(histogram, buckets, q):
+    """Quantile q interpolated within its bucket (None when empty)"""
+    if not histogram or not histogram['count']:
+        return None
+    rank = q * histogram['count']
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(buckets, histogram['buckets']):
+        if count and seen + count >= rank:
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    # In the +Inf bucket: the largest finite bound is the best estimate
+    return buckets[-1]
+
+
+def _histogram_summary(histogram, buckets, quantile, count_name='requests'):
+    return {
+        count_name: histogram['count'],
+        'mean': histogram['sum'] / histogram['count'] if histogram['count'] else None,
+        'p50': quantile(0.5),
+        'p95': quantile(0.95),
+        'p99': quantile(0.99),
+        'buckets': dict(zip(map(str, buckets), histogram['buckets']))
+    }
+
+
+def _histogram_lines(metric, labels, histogram, buckets):
+    """Prometheus lines of one histogram; labels is 'name="value",' or ''"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets, histogram['buckets']):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}le="+Inf"}} {histogram["count"]}')
+    labels = labels.rstrip(',')
+    selector = f'{{{labels}}}' if labels else ''
+    lines.append(f'{metric}_sum{selector} {histogram["sum"]:.6f}')
+    lines.append(f'{metric}_count{selector} {histogram["count"]}')
+    return lines
+
+
+class RunMetrics:
+    """Stage timers, per-table counters and request latency histograms of one ingest run.
+
+    timer(stage) adds the time spent inside it to the stage, minus the time
+    of stages nested in it on the same thread, so stages add up instead of
+    overlapping. Stages timed on upload threads (serialize) are summed over
+    the threads. Everything is safe to update from several threads.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, commit_buckets=COMMIT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.commit_buckets = tuple(commit_buckets)
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stage_seconds = Counter()
+        self.stage_calls = Counter()
+        self.counters = {}
+        self.latency = {}
+        # Seconds from reading a row to committing it, per row (follow mode)
+        self.commit_latency = _new_histogram(self.commit_buckets)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def timer(self, stage):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add_time(stage, elapsed - nested)
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    def count(self, name, table_name, value=1):
+        with self._lock:
+            counters = self.counters.setdefault(table_name, Counter())
+            counters[name] += value
+
+    def observe_latency(self, table_name, seconds):
+        """Record one request (upsert attempt) of table_name that took seconds"""
+        with self._lock:
+            histogram = self.latency.get(table_name)
+            if histogram is None:
+                histogram = self.latency[table_name] = _new_histogram(self.buckets)
+            _observe(histogram, self.buckets, seconds)
+
+    def observe_commit_latency(self, seconds, rows=1):
+        """Record rows that were committed seconds after they were read"""
+        with self._lock:
+            _observe(self.commit_latency, self.commit_buckets, seconds, rows)
+
+    def total(self, name):
+        """Counter name summed over all tables"""
+        with self._lock:
+            return sum(counters[name] for counters in self.counters.values())
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def quantile(self, table_name, q):
+        """Latency quantile q of a table, interpolated within its histogram bucket (None without requests)"""
+        with self._lock:
+            return _quantile(self.latency.get(table_name), self.buckets, q)
+
+    def commit_quantile(self, q):
+        """Ingest-to-commit latency quantile q (None before the first commit)"""
+        with self._lock:
+            return _quantile(self.commit_latency, self.commit_buckets, q)
+
+    def summary(self):
+        """Everything recorded, as a JSON-serializable dict"""
+        with self._lock:
+            tables = {name: dict(counters) for name, counters in self.counters.items()}
+            latency = {name: dict(histogram) for name, histogram in self.latency.items()}
+            commit_latency = dict(self.commit_latency)
+            stages = {stage: {'seconds': round(seconds, 6), 'calls': self.stage_calls[stage]}
+                      for stage, seconds in self.stage_seconds.items()}
+        for table_name, histogram in latency.items():
+            tables.setdefault(table_name, {})['latency_seconds'] = _histogram_summary(
+                histogram, self.buckets, lambda q: self.quantile(table_name, q))
+        summary = {
+            'started_at': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'duration_seconds': round(self.elapsed(), 6),
+            'stages': stages,
+            'tables': tables
+        }
+        if commit_latency['count']:
+            summary['commit_latency_seconds'] = _histogram_summary(commit_latency, self.commit_buckets,
+                                                                   self.commit_quantile, 'rows')
+        return summary
+
+    def prometheus_text(self):
+        """The run in the Prometheus text exposition format (for node_exporter's textfile collector)"""
+        prefix = PROMETHEUS_PREFIX
+        lines = [
+            f'# HELP {prefix}_last_run_timestamp_seconds End of the last ingest run',
+            f'# TYPE {prefix}_last_run_timestamp_seconds gauge',
+            f'{prefix}_last_run_timestamp_seconds {time.time():.3f}',
+            f'# HELP {prefix}_duration_seconds Wall-clock duration of the last run',
+            f'# TYPE {prefix}_duration_seconds gauge',
+            f'{prefix}_duration_seconds {self.elapsed():.6f}',
+            f'# HELP {prefix}_stage_seconds Time spent in each stage of the last run, nested stages excluded',
+            f'# TYPE {prefix}_stage_seconds gauge'
+        ]
+        with self._lock:
+            lines += [f'{prefix}_stage_seconds{{stage="{_label(stage)}"}} {seconds:.6f}'
+                      for stage, seconds in sorted(self.stage_seconds.items())]
+            for name, help_text in TABLE_COUNTERS.items():
+                lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} gauge']
+                lines += [f'{prefix}_{name}{{table="{_label(table_name)}"}} {counters[name]}'
+                          for table_name, counters in sorted(self.counters.items())]
+            metric = f'{prefix}_request_duration_seconds'
+            lines += [f'# HELP {metric} Latency of upsert requests in the last run',
+                      f'# TYPE {metric} histogram']
+            for table_name, histogram in sorted(self.latency.items()):
+                lines += _histogram_lines(metric, f'table="{_label(table_name)}",', histogram, self.buckets)
+            if self.commit_latency['count']:
+                metric = f'{prefix}_commit_latency_seconds'
+                lines += [f'# HELP {metric} Seconds from reading a row to committing it (follow mode)',
+                          f'# TYPE {metric} histogram']
+                lines += _histogram_lines(metric, '', self.commit_latency, self.commit_buckets)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, textfile=METRICS_TEXTFILE, summary_file=RUN_SUMMARY_FILE):
+        """Write the Prometheus textfile and the JSON summary, each atomically (skip either with None)"""
+        outputs = []
+        if textfile:
+            outputs.append((textfile, self.prometheus_text()))
+        if summary_file:
+            outputs.append((summary_file, json.dumps(self.summary(), indent=2) + '\n'))
+        for path, content in outputs:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+    def progress_line(self):
+        elapsed = self.elapsed()
+        rows = self.total('rows')
+        return (f"⏳ {elapsed:6.1f}s  {rows:,} rows uploaded ({rows / max(elapsed, 1e-9):,.0f}/s)  "
+                f"{self.total('batches')} batches  {self.total('retries')} retries  "
+                f"{self.total('failed_batches')} failed  {self.total('request_bytes') / 2**20:.1f} MiB sent"
+                + self.commit_latency_report())
+
+    def commit_latency_report(self):
+        """'  commit p50 X ms, p99 Y ms' once rows were committed in follow mode, '' otherwise"""
+        p50, p99 = self.commit_quantile(0.5), self.commit_quantile(0.99)
+        if p50 is None:
+            return ''
+        return f"  commit p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms"
+
+
+class ProgressReporter:
+    """Print metrics.progress_line() every interval seconds, from a background thread, until closed"""
+
+    def __init__(self, metrics, interval=10.0):
+        self.metrics = metrics
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.metrics.progress_line(), flush=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop reporting and print a last line"""
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+            print(self.metrics.progress_line(), flush=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,121 @@
+# Schema of the Supabase tables, mirroring create_tables.sql. Kept free of
+# heavy imports so the schema can be printed or parsed without loading pandas
+# or the Supabase client.
+
+# Create SQL statements for table creation
+table_creation_sql = {
+    'farms': """
+    CREATE TABLE IF NOT EXISTS farms (
+        id SERIAL PRIMARY KEY,
+        farm_name VARCHAR(50) UNIQUE NOT NULL,
+        latitude DECIMAL(10, 8) NOT NULL,
+        longitude DECIMAL(11, 8) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    """,
+    
+    'sensor_readings': """
+    CREATE TABLE IF NOT EXISTS sensor_readings (
+        id SERIAL PRIMARY KEY,
+        farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        dissolved_oxygen DECIMAL(8, 6),
+        temperature DECIMAL(6, 3),
+        ph DECIMAL(5, 3),
+        conductivity DECIMAL(8, 3),
+        par DECIMAL(8, 3),
+        ammonia DECIMAL(8, 6),
+        nitrite DECIMAL(8, 6),
+        turbidity DECIMAL(8, 3),
+        chlorophyll DECIMAL(8, 3),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        UNIQUE(farm_id, timestamp)
+    );
+    """,
+    
+    'weather_data': """
+    CREATE TABLE IF NOT EXISTS weather_data (
+        id SERIAL PRIMARY KEY,
+        farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        air_pressure DECIMAL(8, 3),
+        wind_speed DECIMAL(6, 3),
+        rainfall DECIMAL(6, 2),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        UNIQUE(farm_id, timestamp)
+    );
+    """,
+    
+    'operational_data': """
+    CREATE TABLE IF NOT EXISTS operational_data (
+        id SERIAL PRIMARY KEY,
+        farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        flow_rate DECIMAL(8, 3),
+        lirio_coverage DECIMAL(6, 3),
+        aerator_status INTEGER CHECK (aerator_status IN (0, 1)),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        UNIQUE(farm_id, timestamp)
+    );
+    """,
+    
+    'metric_rollups_hourly': """
+    CREATE TABLE IF NOT EXISTS metric_rollups_hourly (
+        id SERIAL PRIMARY KEY,
+        farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+        metric VARCHAR(50) NOT NULL,
+        bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+        min_value DOUBLE PRECISION,
+        max_value DOUBLE PRECISION,
+        mean_value DOUBLE PRECISION,
+        sum_value DOUBLE PRECISION,
+        sample_count INTEGER NOT NULL,
+        last_value DOUBLE PRECISION,
+            last_timestamp TIMESTAMP WITH TIME ZONE,
+        UNIQUE(farm_id, metric, bucket)
+    );
+    """,
+    
+    'metric_rollups_daily': """
+    CREATE TABLE IF NOT EXISTS metric_rollups_daily (
+        id SERIAL PRIMARY KEY,
+        farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE,
+        metric VARCHAR(50) NOT NULL,
+        bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+        min_value DOUBLE PRECISION,
+        max_value DOUBLE PRECISION,
+        mean_value DOUBLE PRECISION,
+        sum_value DOUBLE PRECISION,
+        sample_count INTEGER NOT NULL,
+        last_value DOUBLE PRECISION,
+            last_timestamp TIMESTAMP WITH TIME ZONE,
+        UNIQUE(farm_id, metric, bucket)
+    );
+    """
+}
+
+# Create indexes for better performance
+index_creation_sql = [
+    "CREATE INDEX IF NOT EXISTS idx_sensor_readings_farm_timestamp ON sensor_readings(farm_id, timestamp);",
+    "CREATE INDEX IF NOT EXISTS idx_weather_data_farm_timestamp ON weather_data(farm_id, timestamp);",
+    "CREATE INDEX IF NOT EXISTS idx_operational_data_farm_timestamp ON operational_data(farm_id, timestamp);",
+    "CREATE INDEX IF NOT EXISTS idx_farms_name ON farms(farm_name);"
+]
+
+
+def print_schema_sql(tables=None):
+    """Print the CREATE TABLE statements (of tables, default all) and the indexes for manual setup"""
+    print("\n" + "="*60)
+    print("📋 SQL FOR MANUAL TABLE CREATION (if needed)")
+    print("="*60)
+    for table_name, sql in table_creation_sql.items():
+        if tables and table_name not in tables:
+            continue
+        print(f"\n-- {table_name.upper()} TABLE")
+        print(sql)
+
+    print("\n-- INDEXES")
+    for sql in index_creation_sql:
+        if not tables or any(f" ON {table_name}(" in sql for table_name in tables):
+            print(sql)
@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from column_mapping import DECIMAL_COLUMNS, TABLE_COLUMNS
+from schema_sql import table_creation_sql
+from timestamp_parsing import format_timestamps
+
+# Rows that failed validation, one JSON object per (row, table) with the reasons
+QUARANTINE_FILE = os.path.join('.fishapp', 'quarantine.jsonl')
+
+# Smallest and largest value of the Postgres integer types
+INTEGER_RANGES = {
+    'SMALLINT': (-2**15, 2**15 - 1),
+    'INTEGER': (-2**31, 2**31 - 1),
+    'BIGINT': (-2**63, 2**63 - 1)
+}
+
+_NUMERIC_COLUMN = re.compile(
+    r'^\s*(\w+)\s+(DECIMAL|NUMERIC|SMALLINT|INTEGER|BIGINT|DOUBLE PRECISION|REAL)\b'
+    r'\s*(?:\(\s*(\d+)\s*,\s*(\d+)\s*\))?(.*?),?\s*$', re.I | re.M)
+_CHECK_IN = re.compile(r'CHECK\s*\(\s*(\w+)\s+IN\s*\(([^)]*)\)\s*\)', re.I)
+_CHECK_BETWEEN = re.compile(r'CHECK\s*\(\s*(\w+)\s+BETWEEN\s+(-?[\d.]+)\s+AND\s+(-?[\d.]+)\s*\)', re.I)
+_CHECK_COMPARE = re.compile(r'CHECK\s*\(\s*(\w+)\s*(>=|<=|>|<)\s*(-?[\d.]+)\s*\)', re.I)
+
+
+def column_rules(tables=None):
+    """{table: {column: rule}} of every numeric column declared in table_creation_sql (or tables).
+
+    A rule holds the column type ('decimal', 'integer' or 'float'), the
+    DECIMAL precision and scale or the integer range, not_null, and the
+    values or bounds of a CHECK (column IN (...)), CHECK (column BETWEEN a
+    AND b) or CHECK (column >= a) style constraint.
+    """
+    rules = {}
+    for table_name, sql in (tables or table_creation_sql).items():
+        table_rules = rules[table_name] = {}
+        for name, sql_type, precision, scale, rest in _NUMERIC_COLUMN.findall(sql):
+            sql_type = sql_type.upper()
+            if sql_type in ('DECIMAL', 'NUMERIC') and precision:
+                rule = {'type': 'decimal', 'precision': int(precision), 'scale': int(scale)}
+            elif sql_type in INTEGER_RANGES:
+                rule = {'type': 'integer', 'min': INTEGER_RANGES[sql_type][0], 'max': INTEGER_RANGES[sql_type][1]}
+            else:
+                rule = {'type': 'float'}
+            rule['not_null'] = bool(re.search(r'\bNOT\s+NULL\b', rest, re.I) or re.search(r'PRIMARY\s+KEY', rest, re.I))
+            table_rules[name] = rule
+
+        for name, values in _CHECK_IN.findall(sql):
+            if name in table_rules:
+                table_rules[name]['allowed'] = tuple(float(value) for value in values.split(','))
+        for name, low, high in _CHECK_BETWEEN.findall(sql):
+            if name in table_rules:
+                table_rules[name]['check_min'], table_rules[name]['check_max'] = float(low), float(high)
+        for name, operator, bound in _CHECK_COMPARE.findall(sql):
+            if name in table_rules:
+                table_rules[name]['check_' + operator] = float(bound)
+    return rules
+
+
+COLUMN_RULES = column_rules()
+
+
+def column_failures(values, rule):
+    """{reason: boolean mask} of the values (float64, as they would be sent) that rule rejects"""
+    failures = {}
+    missing = np.isnan(values)
+    if missing.any():
+        failures['missing (NOT NULL)' if rule['not_null'] else 'not a number'] = missing
+    finite = np.isfinite(values)
+    infinite = ~finite & ~missing
+    if infinite.any():
+        failures['infinite'] = infinite
+    if not finite.any():
+        return failures
+
+    if rule['type'] == 'decimal':
+        precision, scale = rule['precision'], rule['scale']
+        # DECIMAL(p, s) keeps p - s digits before the point once rounded to s decimals
+        overflow = finite & (np.abs(np.round(np.where(finite, values, 0), scale)) >= 10.0 ** (precision - scale))
+        if overflow.any():
+            failures[f'does not fit DECIMAL({precision}, {scale})'] = overflow
+    elif rule['type'] == 'integer':
+        fraction = finite & (values != np.floor(np.where(finite, values, 0)))
+        if fraction.any():
+            failures['not an integer'] = fraction
+        out_of_range = finite & ((values < rule['min']) | (values > rule['max']))
+        if out_of_range.any():
+            failures['out of the integer range'] = out_of_range
+
+    checks = []
+    if 'allowed' in rule:
+        checks.append((~np.isin(values, rule['allowed']),
+                       f"CHECK IN ({', '.join(f'{value:g}' for value in rule['allowed'])})"))
+    if 'check_min' in rule:
+        checks.append(((values < rule['check_min']) | (values > rule['check_max']),
+                       f"CHECK BETWEEN {rule['check_min']:g} AND {rule['check_max']:g}"))
+    for operator, compare in (('>=', np.less), ('>', np.less_equal), ('<=', np.greater), ('<', np.greater_equal)):
+        if 'check_' + operator in rule:
+            checks.append((compare(values, rule['check_' + operator]), f"CHECK {operator} {rule['check_' + operator]:g}"))
+    for violated, reason in checks:
+        violated = finite & violated
+        if violated.any():
+            failures[reason] = violated
+    return failures
+
+
+def validate_rows(df, tables=TABLE_COLUMNS, rules=COLUMN_RULES):
+    """Check the mapped columns of df against the schema, a whole column at a time.
+
+    Catches what would make the server reject a whole batch: NaN and
+    infinite readings, values that overflow their DECIMAL precision,
+    non-integers and CHECK constraint violations. Returns {table_name:
+    {row position: [reasons]}} of the rows a table would reject ({} when
+    every row passes).
+    """
+    rejected = {}
+    for table_name, mapping in tables.items():
+        table_rules = rules.get(table_name, {})
+        reasons = {}
+        for source, target in mapping.items():
+            rule = table_rules.get(target)
+            if rule is None or source not in df.columns:
+                continue
+            values = _sent_values(df[source], target)
+            for reason, mask in column_failures(values, rule).items():
+                for position in np.flatnonzero(mask).tolist():
+                    reasons.setdefault(position, []).append(f"{target}={values[position]:g}: {reason}")
+        if reasons:
+            rejected[table_name] = reasons
+    return rejected
+
+
+def valid_masks(rejected, size, tables=TABLE_COLUMNS):
+    """{table_name: boolean mask of the rows that passed} for every table"""
+    masks = {}
+    for table_name in tables:
+        mask = np.ones(size, dtype=bool)
+        mask[list(rejected.get(table_name, ()))] = False
+        masks[table_name] = mask
+    return masks
+
+
+def drop_rejected_values(df, rejected, tables=TABLE_COLUMNS):
+    """A copy of df where the columns of each table are blank (NaN) in the rows that table rejected.
+
+    Rollups and alerts then skip the rejected readings like missing ones,
+    while the rest of each row is still used.
+    """
+    df = df.copy()
+    for table_name, reasons in rejected.items():
+        bad = np.zeros(len(df), dtype=bool)
+        bad[list(reasons)] = True
+        for source in tables[table_name]:
+            if source in df.columns:
+                df[source] = df[source].where(~bad)
+    return df
+
+
+def _json_value(value):
+    value = float(value)
+    return value if np.isfinite(value) else str(value)
+
+
+def _sent_values(series, target):
+    """series as float64, float32 DECIMAL columns rounded to their scale as when they are sent"""
+    values = series.to_numpy(dtype='float64')
+    if target in DECIMAL_COLUMNS and series.dtype == np.float32:
+        values = values.round(DECIMAL_COLUMNS[target][1])
+    return values
+
+
+class QuarantineFile:
+    """Append-only JSON-lines file of the rows validation rejected, one entry per (row, table)"""
+
+    def __init__(self, path=QUARANTINE_FILE):
+        self.path = path
+        self.rows = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, df, rejected, source=None, tables=TABLE_COLUMNS):
+        """Record the rows of df that validate_rows rejected, with their values and reasons"""
+        quarantined_at = datetime.now(timezone.utc).isoformat()
+        lines = []
+        for table_name, reasons in rejected.items():
+            positions = list(reasons)
+            rows = df.iloc[positions]
+            timestamps = format_timestamps(rows['timestamp']) if 'timestamp' in rows else [None] * len(rows)
+            columns = {target: _sent_values(rows[source], target)
+                       for source, target in tables[table_name].items() if source in rows.columns}
+            for i, position in enumerate(positions):
+                lines.append(json.dumps({
+                    'table': table_name,
+                    'source': source,
+                    'farm': str(rows['pond_id'].iloc[i]) if 'pond_id' in rows else None,
+                    'timestamp': timestamps[i],
+                    'reasons': reasons[position],
+                    'row': {target: _json_value(values[i]) for target, values in columns.items()},
+                    'quarantined_at': quarantined_at
+                }))
+        if not lines:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+            for table_name, reasons in rejected.items():
+                self.rows[table_name] += len(reasons)
+
+
+def count_quarantined(path=QUARANTINE_FILE):
+    """{table_name: rows} recorded in the quarantine file ({} when there is none)"""
+    counts = Counter()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    counts[json.loads(line)['table']] += 1
+    return dict(counts)
@@ -0,0 +1,115 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from column_mapping import DECIMAL_COLUMNS, INTEGER_COLUMNS, TABLE_COLUMNS
+from frame_cache import cached_frame
+from run_metrics import timed
+from timestamp_parsing import DEFAULT_SOURCE_TIMEZONE, normalize_timestamps, parse_timestamps
+
+# Version of the frames read_sensor_csv and compact_frame build, part of their frame
+# cache key: bump it whenever their output changes (dtypes, columns, narrowing)
+FRAME_VERSION = 2
+
+# float32 keeps this many significant digits exactly, so DECIMAL(p, s) columns with
+# p <= FLOAT32_DIGITS survive the round trip once values are rounded to s decimals
+FLOAT32_DIGITS = np.finfo('float32').precision
+
+
+def compact_dtypes(columns):
+    """{CSV column: compact dtype} of the columns present.
+
+    pond_id is categorical, integer columns (aerator_status) are uint8 and
+    reading columns are float32 where their DECIMAL precision in
+    create_tables.sql allows it, float64 otherwise. Timestamps are parsed
+    to datetime64 (an int64 epoch) separately.
+    """
+    dtypes = {}
+    if 'pond_id' in columns:
+        dtypes['pond_id'] = 'category'
+    for mapping in TABLE_COLUMNS.values():
+        for source, target in mapping.items():
+            if source not in columns:
+                continue
+            if target in INTEGER_COLUMNS:
+                dtypes[source] = 'uint8'
+            elif target in DECIMAL_COLUMNS and DECIMAL_COLUMNS[target][0] <= FLOAT32_DIGITS:
+                dtypes[source] = 'float32'
+            else:
+                dtypes[source] = 'float64'
+    for column in ('latitude', 'longitude'):
+        if column in columns:
+            dtypes[column] = 'float64'
+    return dtypes
+
+
+def compact_frame(df):
+    """df with compact column types; unparseable timestamps become NaT.
+
+    float32 columns are rounded to their DECIMAL scale first, which is what
+    the database stores, so nothing is lost that an upload would keep.
+    Text in a numeric column becomes NaN, and an integer column with values
+    that don't fit uint8 (missing, fractional, out of range) stays float64,
+    so schema validation can quarantine those rows instead of a cast failing
+    or wrapping around. Timestamps are parsed but not converted from their
+    source timezone (normalize_timestamps does that).
+    """
+    df = df.copy()
+    if 'timestamp' in df.columns:
+        df['timestamp'] = parse_timestamps(df['timestamp'], source_tz=None)
+    targets = {source: target for mapping in TABLE_COLUMNS.values() for source, target in mapping.items()}
+    for column, dtype in compact_dtypes(df.columns).items():
+        if dtype == 'category':
+            df[column] = df[column].astype(dtype)
+            continue
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        values = values.astype('float64')
+        if dtype == 'float32':
+            df[column] = values.round(DECIMAL_COLUMNS[targets[column]][1]).astype('float32')
+        elif dtype == 'uint8':
+            fits = values.between(0, 255) & (values == values.round())
+            df[column] = values.astype('uint8') if fits.all() else values
+        else:
+            df[column] = values
+    return df
+
+
+def bytes_per_row(df):
+    """In-memory size of df (strings included) per row"""
+    return df.memory_usage(index=False, deep=True).sum() / max(len(df), 1)
+
+
+def read_sensor_csv(path, metrics=None, **read_csv_options):
+    """pd.read_csv followed by compact_frame; attrs['source_bytes_per_row'] is the size as parsed"""
+    with timed(metrics, 'load'):
+        parsed = pd.read_csv(path, **read_csv_options)
+    with timed(metrics, 'parse'):
+        df = compact_frame(parsed)
+    df.attrs['source_bytes_per_row'] = float(bytes_per_row(parsed))
+    return df
+
+
+def load_sensor_frame(path, use_cache=True, source_tz=DEFAULT_SOURCE_TIMEZONE, metrics=None):
+    """Load a readings CSV in compact form, from the frame cache when it is unchanged.
+
+    Timestamps are normalized to naive UTC and rows whose timestamp doesn't
+    parse are dropped. Returns (frame, number of rows dropped). metrics (a
+    RunMetrics) gets the time spent reading as 'load' and converting types
+    as 'parse'.
+    """
+    read = partial(read_sensor_csv, metrics=metrics)
+    with timed(metrics, 'load'):
+        df = cached_frame(path, f'sensor-csv-v{FRAME_VERSION}', read) if use_cache else read(path)
+    with timed(metrics, 'parse'):
+        return normalize_timestamps(df, source_tz=source_tz)
+
+
+def memory_report(df):
+    """'N bytes/row (M as parsed)' for a frame from load_sensor_frame"""
+    report = f"{bytes_per_row(df):.0f} bytes/row"
+    if 'source_bytes_per_row' in df.attrs:
+        report += f" ({df.attrs['source_bytes_per_row']:.0f} as parsed by pd.read_csv)"
+    return report
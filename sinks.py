@@ -0,0 +1,402 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+
+from column_mapping import INTEGER_COLUMNS, TABLE_COLUMNS
+from rollups import ROLLUP_TABLES
+from run_metrics import timed
+
+SINK_KINDS = ('rest', 'postgres', 'sqlite')
+
+
+def _conflict_columns(on_conflict):
+    return [column.strip() for column in on_conflict.split(',')]
+
+
+def _row_columns(rows):
+    """Column names of a batch, in the order of its first row"""
+    return list(rows[0].keys())
+
+
+FARM_COLUMNS = ('id', 'farm_name', 'latitude', 'longitude', 'updated_at')
+
+# Fast gzip level: most of the size win for a fraction of the CPU of the default 9
+GZIP_LEVEL = 1
+
+
+def encode_rows(rows):
+    """JSON request body of a batch: the C encoder without whitespace"""
+    return json.dumps(rows, separators=(',', ':')).encode()
+
+
+def _api_error(response):
+    """postgrest.APIError for a failed response, built the way postgrest-py builds it"""
+    from postgrest.exceptions import APIError
+    try:
+        error = response.json()
+    except ValueError:
+        error = None
+    if not isinstance(error, dict):
+        error = {'message': 'JSON could not be generated', 'code': response.status_code,
+                 'hint': 'Refer to full message for details', 'details': str(response.content)}
+    return APIError(error)
+
+# Rows per page when reading the farms catalog (PostgREST caps responses at 1000 rows by default)
+FARM_PAGE_SIZE = 1000
+
+# Farm ids per request when reading stored readings back, to keep the query string short
+FARMS_PER_READ = 200
+
+
+def _chunks(values, size):
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+class RestSink:
+    """Upserts through the Supabase REST API (PostgREST), one JSON request per batch.
+
+    Batch bodies are encoded here (compact JSON, gzip-compressed with
+    compress) and posted on the client's own HTTP session, with the same
+    headers and parameters postgrest-py would send. A server that answers
+    415 to a compressed body gets uncompressed ones from then on. With
+    metrics (a RunMetrics), encoding is timed as the 'serialize' stage and
+    request bytes are counted per table.
+    """
+
+    # None: the uploader picks (and adapts) the batch size
+    batch_size = None
+
+    def __init__(self, client, compress=False, metrics=None):
+        self.client = client
+        self.compress = compress
+        self.metrics = metrics
+        self.target = getattr(client, 'supabase_url', None)
+        # Bytes of request bodies sent by upsert(), before and after compression
+        self.body_bytes = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, table_name, rows, on_conflict):
+        with timed(self.metrics, 'serialize'):
+            body = encode_rows(rows)
+        params = {'on_conflict': on_conflict, 'columns': ','.join(f'"{column}"' for column in _row_columns(rows))}
+        compress = self.compress
+        response = self._post(table_name, body, params, compress)
+        if compress and response.status_code == 415:
+            # The endpoint doesn't take compressed bodies
+            self.compress = False
+            response = self._post(table_name, body, params, False)
+        if not response.is_success:
+            raise _api_error(response)
+
+    def _post(self, table_name, body, params, compress):
+        headers = {'Prefer': 'return=minimal,resolution=merge-duplicates', 'Content-Type': 'application/json'}
+        content = body
+        if compress:
+            with timed(self.metrics, 'serialize'):
+                content = gzip.compress(body, GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+        with self._lock:
+            self.body_bytes += len(body)
+            self.sent_bytes += len(content)
+        if self.metrics is not None:
+            self.metrics.count('body_bytes', table_name, len(body))
+            self.metrics.count('request_bytes', table_name, len(content))
+        return self.client.postgrest.session.post(table_name, content=content, params=params, headers=headers)
+
+    def upsert_farms(self, farms):
+        """Upsert farm catalog rows; returns the stored id, farm_name and updated_at of each"""
+        stored = []
+        for start in range(0, len(farms), FARM_PAGE_SIZE):
+            result = self.client.table('farms').upsert(farms[start:start + FARM_PAGE_SIZE],
+                                                       on_conflict='farm_name').execute()
+            stored.extend({column: row.get(column) for column in ('id', 'farm_name', 'updated_at')}
+                          for row in result.data)
+        return stored
+
+    def probe_farms(self):
+        """(number of farms, newest updated_at) in one request"""
+        result = (self.client.table('farms').select('updated_at', count='exact')
+                  .order('updated_at', desc=True, nullsfirst=False).limit(1).execute())
+        return result.count, result.data[0]['updated_at'] if result.data else None
+
+    def fetch_farms(self):
+        """Every farm row, read page by page"""
+        rows = []
+        while True:
+            result = (self.client.table('farms').select(', '.join(FARM_COLUMNS)).order('id')
+                      .range(len(rows), len(rows) + FARM_PAGE_SIZE - 1).execute())
+            rows.extend(result.data)
+            if len(result.data) < FARM_PAGE_SIZE:
+                return rows
+
+    def fetch_readings(self, table_name, columns, farm_ids, start, end):
+        """Stored farm_id, timestamp and columns of farm_ids from start up to end, read page by page"""
+        select = ', '.join(['farm_id', 'timestamp', *columns])
+        rows = []
+        for farms in _chunks(list(farm_ids), FARMS_PER_READ):
+            offset = 0
+            while True:
+                result = (self.client.table(table_name).select(select).in_('farm_id', farms)
+                          .gte('timestamp', start).lt('timestamp', end)
+                          .order('id').range(offset, offset + FARM_PAGE_SIZE - 1).execute())
+                rows.extend(result.data)
+                offset += len(result.data)
+                if len(result.data) < FARM_PAGE_SIZE:
+                    break
+        return rows
+
+    def close(self):
+        pass
+
+
+class PostgresCopySink:
+    """Bulk loads straight into Postgres: COPY into a temp table, then one INSERT ... ON CONFLICT.
+
+    Needs psycopg 3 (`pip install "psycopg[binary]"`) and a connection string
+    to the database behind Supabase (Project settings -> Database). Each
+    upload thread gets its own connection.
+    """
+
+    # Rows per COPY; a round trip costs the same for 1,000 rows or 50,000
+    batch_size = 50000
+
+    def __init__(self, dsn):
+        try:
+            import psycopg
+        except ImportError as e:
+            raise ImportError('the postgres sink needs psycopg 3: pip install "psycopg[binary]"') from e
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self.target = dsn
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection.closed:
+            connection = self._psycopg.connect(self.dsn)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def upsert(self, table_name, rows, on_conflict):
+        sql = self._psycopg.sql
+        columns = _row_columns(rows)
+        keys = _conflict_columns(on_conflict)
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+        key_list = sql.SQL(', ').join(map(sql.Identifier, keys))
+        updates = sql.SQL(', ').join(
+            sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(column)) for column in columns if column not in keys
+        )
+        staging = sql.Identifier(f'staging_{table_name}')
+
+        connection = self._connection()
+        try:
+            with connection.cursor() as cursor:
+                # Only the batch's columns and their types: no id default, no constraints
+                cursor.execute(sql.SQL(
+                    'CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DELETE ROWS AS SELECT {} FROM {} WITH NO DATA'
+                ).format(staging, column_list, sql.Identifier(table_name)))
+                with cursor.copy(sql.SQL('COPY {} ({}) FROM STDIN').format(staging, column_list)) as copy:
+                    for row in rows:
+                        copy.write_row([row[column] for column in columns])
+                # A key repeated inside one batch would make ON CONFLICT fail; the
+                # last copy of it wins, as it would with one upsert per row
+                cursor.execute(sql.SQL(
+                    'INSERT INTO {target} ({columns}) '
+                    'SELECT DISTINCT ON ({keys}) {columns} FROM {staging} ORDER BY {keys}, ctid DESC '
+                    'ON CONFLICT ({keys}) DO UPDATE SET {updates}'
+                ).format(target=sql.Identifier(table_name), columns=column_list, keys=key_list,
+                         staging=staging, updates=updates))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def upsert_farms(self, farms):
+        connection = self._connection()
+        stored = []
+        try:
+            with connection.cursor() as cursor:
+                for farm in farms:
+                    cursor.execute(
+                        'INSERT INTO farms (farm_name, latitude, longitude, updated_at) '
+                        'VALUES (%(farm_name)s, %(latitude)s, %(longitude)s, %(updated_at)s) '
+                        'ON CONFLICT (farm_name) DO UPDATE SET latitude = EXCLUDED.latitude, '
+                        'longitude = EXCLUDED.longitude, updated_at = EXCLUDED.updated_at '
+                        'RETURNING id, farm_name, updated_at',
+                        farm
+                    )
+                    farm_id, farm_name, updated_at = cursor.fetchone()
+                    stored.append({'id': farm_id, 'farm_name': farm_name, 'updated_at': updated_at})
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return stored
+
+    def _select(self, statement, params=None):
+        connection = self._connection()
+        with connection.cursor() as cursor:
+            cursor.execute(statement, params)
+            rows = cursor.fetchall()
+        connection.commit()
+        return rows
+
+    def probe_farms(self):
+        (count, latest), = self._select('SELECT count(*), max(updated_at) FROM farms')
+        return count, latest
+
+    def fetch_farms(self):
+        return [dict(zip(FARM_COLUMNS, row)) for row in self._select(f"SELECT {', '.join(FARM_COLUMNS)} FROM farms")]
+
+    def fetch_readings(self, table_name, columns, farm_ids, start, end):
+        sql = self._psycopg.sql
+        names = ['farm_id', 'timestamp', *columns]
+        statement = sql.SQL('SELECT {} FROM {} WHERE farm_id = ANY(%s) AND timestamp >= %s AND timestamp < %s').format(
+            sql.SQL(', ').join(map(sql.Identifier, names)), sql.Identifier(table_name))
+        return [dict(zip(names, row)) for row in self._select(statement, (list(farm_ids), start, end))]
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def sqlite_schema():
+    """CREATE TABLE statements for the create_tables.sql schema in SQLite types"""
+    statements = [
+        'CREATE TABLE IF NOT EXISTS farms ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, farm_name TEXT UNIQUE NOT NULL, '
+        'latitude REAL NOT NULL, longitude REAL NOT NULL, updated_at TEXT)'
+    ]
+    for table_name, mapping in TABLE_COLUMNS.items():
+        columns = ', '.join(
+            f"{target} {'INTEGER' if target in INTEGER_COLUMNS else 'REAL'}" for target in mapping.values()
+        )
+        statements.append(
+            f'CREATE TABLE IF NOT EXISTS {table_name} ('
+            f'id INTEGER PRIMARY KEY AUTOINCREMENT, farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE, '
+            f'timestamp TEXT NOT NULL, {columns}, UNIQUE(farm_id, timestamp))'
+        )
+    for table_name in ROLLUP_TABLES.values():
+        statements.append(
+            f'CREATE TABLE IF NOT EXISTS {table_name} ('
+            f'id INTEGER PRIMARY KEY AUTOINCREMENT, farm_id INTEGER REFERENCES farms(id) ON DELETE CASCADE, '
+            f'metric TEXT NOT NULL, bucket TEXT NOT NULL, min_value REAL, max_value REAL, mean_value REAL, '
+            f'sum_value REAL, sample_count INTEGER NOT NULL, last_value REAL, last_timestamp TEXT, '
+            f'UNIQUE(farm_id, metric, bucket))'
+        )
+    return statements
+
+
+# Columns added after the tables were first created: {table_name: {column: SQLite type}}
+ADDED_COLUMNS = {
+    'farms': {'updated_at': 'TEXT'},
+    **{table_name: {'sum_value': 'REAL'} for table_name in ROLLUP_TABLES.values()}
+}
+
+
+class SQLiteSink:
+    """Local SQLite file with the same tables and upsert semantics, for offline runs and tests"""
+
+    batch_size = 5000
+
+    def __init__(self, path):
+        self.path = path
+        self.target = os.path.abspath(path)
+        self._lock = threading.Lock()
+        # Batches arrive from the uploader's threads; the lock serializes them
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        for statement in sqlite_schema():
+            self._db.execute(statement)
+        # Files created before some of the columns existed
+        for table_name, added in ADDED_COLUMNS.items():
+            existing = {column[1] for column in self._db.execute(f'PRAGMA table_info({table_name})')}
+            for column, column_type in added.items():
+                if column not in existing:
+                    self._db.execute(f'ALTER TABLE {table_name} ADD COLUMN {column} {column_type}')
+        self._db.commit()
+
+    def upsert(self, table_name, rows, on_conflict):
+        columns = _row_columns(rows)
+        keys = _conflict_columns(on_conflict)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column not in keys)
+        statement = (
+            f'INSERT INTO {table_name} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}'
+        )
+        with self._lock:
+            try:
+                self._db.executemany(statement, ([row[column] for column in columns] for row in rows))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def upsert_farms(self, farms):
+        self.upsert('farms', farms, 'farm_name')
+        stored = []
+        with self._lock:
+            for start in range(0, len(farms), FARM_PAGE_SIZE):
+                names = [farm['farm_name'] for farm in farms[start:start + FARM_PAGE_SIZE]]
+                cursor = self._db.execute(
+                    f"SELECT id, farm_name, updated_at FROM farms WHERE farm_name IN ({', '.join('?' * len(names))})",
+                    names
+                )
+                stored.extend(dict(zip(('id', 'farm_name', 'updated_at'), row)) for row in cursor)
+        return stored
+
+    def probe_farms(self):
+        with self._lock:
+            return self._db.execute('SELECT count(*), max(updated_at) FROM farms').fetchone()
+
+    def fetch_farms(self):
+        with self._lock:
+            cursor = self._db.execute(f"SELECT {', '.join(FARM_COLUMNS)} FROM farms")
+            return [dict(zip(FARM_COLUMNS, row)) for row in cursor]
+
+    def fetch_readings(self, table_name, columns, farm_ids, start, end):
+        names = ['farm_id', 'timestamp', *columns]
+        rows = []
+        with self._lock:
+            for farms in _chunks(list(farm_ids), FARMS_PER_READ):
+                cursor = self._db.execute(
+                    f"SELECT {', '.join(names)} FROM {table_name} "
+                    f"WHERE farm_id IN ({', '.join('?' * len(farms))}) AND timestamp >= ? AND timestamp < ?",
+                    [*farms, start, end]
+                )
+                rows.extend(dict(zip(names, row)) for row in cursor)
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def as_sink(target):
+    """A sink for target: sinks are returned as they are, Supabase clients get a RestSink"""
+    return target if hasattr(target, 'upsert_farms') else RestSink(target)
+
+
+def make_sink(kind, client=None, target=None, compress=False, metrics=None):
+    """Sink selected on the command line: 'rest' (client), 'postgres' (DSN) or 'sqlite' (file path).
+
+    compress gzips the REST request bodies; metrics (a RunMetrics) gets
+    their serialization time and size.
+    """
+    if kind == 'rest':
+        return RestSink(client, compress=compress, metrics=metrics)
+    if kind == 'postgres':
+        if not target:
+            raise ValueError('the postgres sink needs a connection string (--dsn or DATABASE_URL)')
+        return PostgresCopySink(target)
+    if kind == 'sqlite':
+        return SQLiteSink(target or 'fishapp.sqlite')
+    raise ValueError(f"unknown sink {kind!r}; choose from {', '.join(SINK_KINDS)}")
@@ -0,0 +1,131 @@
+import queue
+import threading
+
+import pandas as pd
+
+from batch_uploader import DEFAULT_MAX_IN_FLIGHT, ConcurrentUploader, new_table_stats
+from run_metrics import timed
+
+# Rows parsed per chunk; peak memory scales with this, not with the file size
+DEFAULT_CHUNK_SIZE = 20000
+
+# Projected chunks allowed to wait between the parser and the uploader
+DEFAULT_QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+def _produce(items, work, out_queue, stop, metrics=None):
+    """Run work(item) for every item in the background, blocking while the queue is full"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        items = iter(items)
+        while True:
+            with timed(metrics, 'load'):
+                item = next(items, _DONE)
+            if item is _DONE or not put(work(item)):
+                return
+    except Exception as e:
+        put(e)
+    finally:
+        put(_DONE)
+
+
+def background_map(items, work, queue_size=DEFAULT_QUEUE_SIZE, metrics=None):
+    """Yield work(item) for every item of an iterable, in order.
+
+    Items are fetched and processed on a background thread that stays at
+    most queue_size results ahead of the consumer. Fetching the next item
+    is timed as the 'load' stage of metrics when given.
+    """
+    out_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(items, work, out_queue, stop, metrics),
+                                name='ingest-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = out_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def stream_payloads(csv_path, project, chunksize=DEFAULT_CHUNK_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                    metrics=None, **read_csv_options):
+    """Yield (rows_in_chunk, project(chunk)) for every chunk of a CSV.
+
+    Parsing and projection run on a background thread that stays at most
+    queue_size chunks ahead of the consumer. Reading the chunks is timed as
+    the 'load' stage of metrics when given.
+    """
+    chunks = pd.read_csv(csv_path, chunksize=chunksize, **read_csv_options)
+    try:
+        yield from background_map(chunks, lambda chunk: (len(chunk), project(chunk)), queue_size, metrics)
+    finally:
+        chunks.close()
+
+
+def take_batches(pending, batch_size, sizers=None, final=False):
+    """Pop full batches from {table: rows} round-robin; with final, also the remainders"""
+    sizers = sizers or {}
+    while True:
+        progressed = False
+        for table_name, rows in pending.items():
+            sizer = sizers.get(table_name)
+            size = sizer.current_size() if sizer else batch_size
+            if len(rows) >= size or (final and rows):
+                if sizer:
+                    sizer.measure_rows(rows)
+                    size = sizer.next_size()
+                batch = rows[:size]
+                del rows[:size]
+                progressed = True
+                yield table_name, batch
+        if not progressed:
+            return
+
+
+def upload_payloads(client, payloads, batch_size=100, sizers=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                    stop_table_on_error=True, retry_policy=None, dead_letters=None, rejects=None, verbose=True,
+                    table_names=(), metrics=None):
+    """Upload an iterable of (rows_read, {table_name: records}) as it is produced.
+
+    Rows left over after cutting a payload into batches are carried into the
+    next one, so batches keep their full size across chunk (or file)
+    boundaries. rejects and metrics (a RunMetrics) are passed on to the
+    uploader.
+    Returns (per-table stats, rows read).
+    """
+    rows_read = 0
+    pending = {table_name: [] for table_name in table_names}
+    with ConcurrentUploader(client, max_in_flight=max_in_flight, stop_table_on_error=stop_table_on_error,
+                            sizers=sizers, retry_policy=retry_policy, dead_letters=dead_letters,
+                            rejects=rejects, verbose=verbose, metrics=metrics) as uploader:
+        for table_name in table_names:
+            uploader.stats.setdefault(table_name, new_table_stats())
+
+        for chunk_rows, chunk_payloads in payloads:
+            rows_read += chunk_rows
+            for table_name, records in chunk_payloads.items():
+                pending.setdefault(table_name, []).extend(records)
+                uploader.stats.setdefault(table_name, new_table_stats())
+            for table_name, batch in take_batches(pending, batch_size, sizers):
+                uploader.submit(table_name, batch)
+
+        for table_name, batch in take_batches(pending, batch_size, sizers, final=True):
+            uploader.submit(table_name, batch)
+        return uploader.join(), rows_read
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# FishAppData.csv timestamps: day-first, two-digit year ('01/08/25 0:00')
+CSV_TIMESTAMP_FORMAT = '%d/%m/%y %H:%M'
+
+# Timezone the naive CSV timestamps are in; they have always been written as UTC
+DEFAULT_SOURCE_TIMEZONE = 'UTC'
+
+
+def parse_timestamps(series, source_tz=DEFAULT_SOURCE_TIMEZONE, fmt=CSV_TIMESTAMP_FORMAT):
+    """Parse a timestamp column to naive-UTC datetime64 (NaT where it doesn't parse).
+
+    One vectorized pass with an explicit format; a column that is already
+    datetime64 (normalized at load time) is only converted, never re-parsed.
+    Wall-clock times that don't exist or are ambiguous in source_tz (DST
+    changes) become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        parsed = series
+    else:
+        parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+    if parsed.dt.tz is None:
+        if source_tz in (None, 'UTC'):
+            return parsed
+        parsed = parsed.dt.tz_localize(source_tz, ambiguous='NaT', nonexistent='NaT')
+    return parsed.dt.tz_convert('UTC').dt.tz_localize(None)
+
+
+def format_timestamps(values):
+    """ISO-8601 UTC strings ('2025-08-01T00:00:00Z') for naive-UTC datetimes; None for NaT.
+
+    Timestamps repeat once per farm, so each distinct value is formatted once.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    if not len(uniques):
+        return [None] * len(codes)
+    strings = np.char.add(np.datetime_as_string(uniques.to_numpy(dtype='datetime64[s]'), unit='s'), 'Z')
+    formatted = strings[codes].astype(object)
+    formatted[codes < 0] = None
+    return formatted.tolist()
+
+
+def normalize_timestamps(df, column='timestamp', source_tz=DEFAULT_SOURCE_TIMEZONE, fmt=CSV_TIMESTAMP_FORMAT):
+    """Replace df[column] by parsed naive-UTC datetimes and drop the rows that don't parse.
+
+    Returns (normalized copy of df, number of rows dropped).
+    """
+    parsed = parse_timestamps(df[column], source_tz, fmt)
+    valid = parsed.notna().to_numpy()
+    failures = int((~valid).sum())
+    df = df.assign(**{column: parsed})
+    if failures:
+        df = df.loc[valid]
+    return df, failures
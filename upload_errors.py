@@ -0,0 +1,102 @@
+import re
+
+# Statement timeout / lock timeout raised by Postgres behind PostgREST
+TIMEOUT_SQLSTATES = {'57014', '55P03'}
+
+# SQLSTATE classes worth retrying: connection exceptions, serialization
+# failures/deadlocks, insufficient resources, operator intervention
+TRANSIENT_SQLSTATE_PREFIXES = ('08', '40', '53', '57')
+
+# HTTP statuses worth retrying; other 4xx mean the request itself is wrong
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# SQLSTATE classes caused by the values of particular rows: data exceptions
+# (out of range, invalid input) and integrity constraint violations
+ROW_SQLSTATE_PREFIXES = ('22', '23')
+
+_STATUS_RE = re.compile(r'^[1-5]\d\d$')
+
+
+def error_status(error):
+    """HTTP status of a failed request, or None when it can't be told.
+
+    postgrest.APIError carries the HTTP status in `code` when the response
+    body wasn't JSON (gateway pages for 413/502/504), otherwise the
+    PostgREST/SQLSTATE code; httpx errors carry a response when there is one.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if isinstance(status, int):
+        return status
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    if isinstance(code, str) and _STATUS_RE.match(code):
+        return int(code)
+    return None
+
+
+def error_sqlstate(error):
+    """SQLSTATE of a failed statement: PostgREST puts it in `code`, psycopg in `sqlstate`"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, str) and code and not _STATUS_RE.match(code):
+        return code
+    sqlstate = getattr(error, 'sqlstate', None)
+    return sqlstate if isinstance(sqlstate, str) and sqlstate else None
+
+
+def is_timeout(error):
+    """True for client-side timeouts and server statement timeouts"""
+    if isinstance(error, TimeoutError):
+        return True
+    # httpx.ReadTimeout, ConnectTimeout, ... all derive from httpx.TimeoutException
+    if any(cls.__name__ == 'TimeoutException' for cls in type(error).__mro__):
+        return True
+    if error_sqlstate(error) in TIMEOUT_SQLSTATES:
+        return True
+    return error_status(error) in (408, 504)
+
+
+def is_overload(error):
+    """True when the request was too big or too slow for the link: timeouts, 413 and 5xx"""
+    if is_timeout(error):
+        return True
+    status = error_status(error)
+    return status is not None and (status == 413 or status >= 500)
+
+
+def is_transient(error):
+    """True when retrying the same request may succeed.
+
+    Timeouts, dropped connections, rate limiting and 5xx gateway errors are
+    transient. Rejected payloads (4xx, constraint violations, bad values) are
+    permanent: sending them again gives the same answer.
+    """
+    if is_timeout(error):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    sqlstate = error_sqlstate(error)
+    if sqlstate:
+        return sqlstate.startswith(TRANSIENT_SQLSTATE_PREFIXES)
+    # No HTTP response at all: connection refused/reset, DNS, TLS... (httpx
+    # TransportError; psycopg OperationalError without a SQLSTATE)
+    return isinstance(error, (ConnectionError, OSError)) or any(
+        cls.__name__ in ('TransportError', 'OperationalError') and cls.__module__.split('.')[0] != 'sqlite3'
+        for cls in type(error).__mro__
+    )
+
+
+def is_row_error(error):
+    """True when a request failed because of some of its rows, so sending fewer rows can succeed.
+
+    Data exceptions and constraint violations come from particular row
+    values; a 413 from a body too large to accept. Errors about the request
+    itself (401/403, missing table, permission or RLS denied) fail every
+    part of it alike.
+    """
+    if error_status(error) == 413:
+        return True
+    sqlstate = error_sqlstate(error)
+    return sqlstate is not None and sqlstate.startswith(ROW_SQLSTATE_PREFIXES)
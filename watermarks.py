@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from timestamp_parsing import parse_timestamps
+
+# Per-table, per-farm high-water marks of the last successful upload
+WATERMARKS_FILE = os.path.join('.fishapp', 'watermarks.json')
+
+
+def load_watermarks(path=WATERMARKS_FILE):
+    """{table_name: {farm_name: pd.Timestamp}} saved by the last run ({} if none)"""
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        table_name: {farm: pd.Timestamp(mark) for farm, mark in farms.items()}
+        for table_name, farms in saved.items()
+    }
+
+
+def save_watermarks(marks, path=WATERMARKS_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    serialised = {
+        table_name: {farm: mark.isoformat() for farm, mark in sorted(farms.items())}
+        for table_name, farms in marks.items()
+    }
+    with open(path, 'w') as f:
+        json.dump(serialised, f, indent=2, sort_keys=True)
+
+
+def fetch_server_watermarks(client, table_names, farm_id_map):
+    """Read max(timestamp) per farm and table back from Supabase.
+
+    One indexed `ORDER BY timestamp DESC LIMIT 1` query per (table, farm),
+    served by the (farm_id, timestamp) indexes from create_tables.sql.
+    """
+    marks = {}
+    for table_name in table_names:
+        table_marks = marks.setdefault(table_name, {})
+        for farm_name, farm_id in farm_id_map.items():
+            result = (client.table(table_name).select('timestamp').eq('farm_id', farm_id)
+                      .order('timestamp', desc=True).limit(1).execute())
+            if result.data:
+                # Stored as timestamptz; the CSV's naive timestamps were written as UTC
+                mark = pd.Timestamp(result.data[0]['timestamp'])
+                if mark.tzinfo is not None:
+                    mark = mark.tz_convert('UTC').tz_localize(None)
+                table_marks[farm_name] = mark
+    return marks
+
+
+def new_rows_mask(df, table_marks, timestamps=None):
+    """Boolean array of rows newer than their farm's mark (farms without a mark: all rows)"""
+    if timestamps is None:
+        timestamps = parse_timestamps(df['timestamp'])
+    if not table_marks:
+        return np.ones(len(df), dtype=bool)
+    limits = pd.to_datetime(df['pond_id'].map(table_marks))
+    # A writable copy: callers narrow the mask in place (to_numpy() is a read-only view under copy-on-write)
+    return np.array(limits.isna() | (timestamps > limits), dtype=bool)
+
+
+def advance_watermarks(marks, table_name, df, timestamps=None):
+    """Raise the marks of table_name to the newest uploaded timestamp of each farm"""
+    if df.empty:
+        return marks
+    if timestamps is None:
+        timestamps = parse_timestamps(df['timestamp'])
+    newest = timestamps.groupby(df['pond_id'].to_numpy()).max().dropna()
+    table_marks = marks.setdefault(table_name, {})
+    for farm_name, mark in newest.items():
+        if farm_name not in table_marks or mark > table_marks[farm_name]:
+            table_marks[farm_name] = mark
+    return marks
+
+
+def merge_watermarks(marks, candidates, table_names):
+    """Copy the candidate marks of table_names into marks, keeping the newest per farm"""
+    for table_name in table_names:
+        table_marks = marks.setdefault(table_name, {})
+        for farm_name, mark in candidates.get(table_name, {}).items():
+            if farm_name not in table_marks or mark > table_marks[farm_name]:
+                table_marks[farm_name] = mark
+    return marks